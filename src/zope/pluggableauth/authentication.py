@@ -13,15 +13,80 @@
 ##############################################################################
 """Pluggable Authentication Utility implementation
 """
+import copy
+import hashlib
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+import transaction
+from transaction.interfaces import TransientError
 from zope.authentication.interfaces import IAuthentication
 from zope.authentication.interfaces import PrincipalLookupError
 from zope.component import queryNextUtility
 from zope.container.btree import BTreeContainer
 from zope.interface import implementer
+from zope.interface import providedBy
 from zope.schema.interfaces import ISourceQueriables
 
 from zope import component
+from zope.pluggableauth import factories
 from zope.pluggableauth import interfaces
+from zope.pluggableauth.plugins.groupfolder import IGroupFolder
+
+
+logger = logging.getLogger(__name__)
+
+_swept = {}
+_swept_lock = threading.Lock()
+
+# (id of database, oid of PAU) -> time of the last sweep while authenticating
+_lastSweeps = {}
+
+# Database (or PAU not stored in one) -> oid of PAU -> credentials digest
+# -> (authenticator plugin name, principal info, generation, expiry time)
+_credentialsCaches = weakref.WeakKeyDictionary()
+_credentials_lock = threading.Lock()
+
+
+def getSweepCounts():
+    """Return a mapping of plugin names to the number of entries swept."""
+    with _swept_lock:
+        return dict(_swept)
+
+
+def resetSweepCounts():
+    with _swept_lock:
+        _swept.clear()
+
+
+def _countSwept(swept):
+    with _swept_lock:
+        for name, count in swept.items():
+            _swept[name] = _swept.get(name, 0) + count
+
+
+def _credentialsKey(name, credentials):
+    try:
+        data = '\0'.join((name, credentials['login'], credentials['password']))
+    except (TypeError, KeyError):
+        return None
+    return hashlib.sha256(data.encode('utf-8')).digest()
+
+
+def _credentialsStamp(authplugin, info):
+    # What a remembered authentication is checked against: the principal's
+    # own stamp if the authenticator has one, else its generation, else
+    # nothing, leaving only the lifetime.
+    getStamp = getattr(authplugin, 'getCredentialsStamp', None)
+    if getStamp is not None:
+        return getStamp(info.id)
+    getGeneration = getattr(authplugin, 'getGeneration', None)
+    if getGeneration is not None:
+        return getGeneration()
+    return None
 
 
 @implementer(
@@ -33,6 +98,28 @@ class PluggableAuthentication(BTreeContainer):
     authenticatorPlugins = ()
     credentialsPlugins = ()
 
+    # Sweep at most `sweepLimit` expired entries every `sweepInterval`
+    # seconds (per process) while authenticating, in a transaction of its
+    # own.  0 disables sweeping.
+    sweepLimit = 0
+    sweepInterval = 60
+
+    # Maximum number of authentications remembered (per process and
+    # database) for credentials plugins with a `credentialsCacheLifetime`.
+    credentialsCacheSize = 1000
+
+    # Maximum number of group combinations `prefixGroupIds` keeps (per
+    # connection).
+    groupIdCacheSize = 10000
+
+    # Return principals from `getPrincipal` that are only created by their
+    # factory, and so get their groups, when more than the title is needed.
+    lazyPrincipals = False
+
+    # Compute the group closure of authenticated principals once, when they
+    # are created, see `Principal.freezeGroups`.
+    freezeGroups = False
+
     def __init__(self, prefix=''):
         super().__init__()
         self.prefix = prefix
@@ -53,11 +140,232 @@ class PluggableAuthentication(BTreeContainer):
         return self._plugins(
             self.credentialsPlugins, interfaces.ICredentialsPlugin)
 
+    def getGroupFolders(self):
+        """Return ``(group folder, prefix)`` pairs of the group folders.
+
+        The group folders are the authenticator plugins providing
+        `IGroupFolder`; the prefixes are the ones of their groups, including
+        the prefix of the PAU:
+
+          >>> from zope.pluggableauth.plugins.groupfolder import GroupFolder
+          >>> pau = PluggableAuthentication('pau.')
+          >>> pau['groups'] = groups = GroupFolder('groups.')
+          >>> pau['roles'] = roles = GroupFolder('roles.')
+          >>> pau.authenticatorPlugins = ('groups', 'roles')
+          >>> [(folder is groups, prefix)
+          ...  for folder, prefix in pau.getGroupFolders()]
+          [(True, 'pau.groups.'), (False, 'pau.roles.')]
+
+        The result is computed once and kept until the plugins or the
+        prefixes are changed:
+
+          >>> pau.getGroupFolders() is pau.getGroupFolders()
+          True
+          >>> pau.prefix = 'other.'
+          >>> [prefix for folder, prefix in pau.getGroupFolders()]
+          ['other.groups.', 'other.roles.']
+          >>> roles.prefix = 'r.'
+          >>> [prefix for folder, prefix in pau.getGroupFolders()]
+          ['other.groups.', 'other.r.']
+          >>> pau.authenticatorPlugins = ('roles', )
+          >>> [prefix for folder, prefix in pau.getGroupFolders()]
+          ['other.r.']
+          >>> del pau['roles']
+          >>> pau.getGroupFolders()
+          ()
+
+        """
+        key = (self.authenticatorPlugins, self.prefix,
+               factories.registryGeneration(
+                   component.getSiteManager().utilities))
+        cached = getattr(self, '_v_groupFolders', None)
+        if (cached is not None and cached[0] == key
+                and all(prefix == self.prefix + folder.prefix
+                        for folder, prefix in cached[1])):
+            return cached[1]
+        folders = tuple(
+            (plugin, self.prefix + plugin.prefix)
+            for name, plugin in self.getAuthenticatorPlugins()
+            if IGroupFolder.providedBy(plugin))
+        self._v_groupFolders = (key, folders)
+        return folders
+
+    def prefixGroupIds(self, ids):
+        """Return a tuple of the group `ids` with the prefix of the PAU.
+
+        Principals usually belong to the same few combinations of groups,
+        so the tuples are shared, and so are the prefixed ids:
+
+          >>> pau = PluggableAuthentication('pau.')
+          >>> pau.prefixGroupIds(('groups.a', 'groups.b'))
+          ('pau.groups.a', 'pau.groups.b')
+          >>> pau.prefixGroupIds(('groups.a', 'groups.b')) is (
+          ...     pau.prefixGroupIds(['groups.a', 'groups.b']))
+          True
+          >>> pau.prefixGroupIds(('groups.b', ))[0] is (
+          ...     pau.prefixGroupIds(('groups.a', 'groups.b'))[1])
+          True
+
+        Changing the prefix of the PAU discards them:
+
+          >>> pau.prefix = 'other.'
+          >>> pau.prefixGroupIds(('groups.a', 'groups.b'))
+          ('other.groups.a', 'other.groups.b')
+
+        """
+        ids = tuple(ids)
+        combinations = getattr(self, '_v_groupIdCombinations', None)
+        if (combinations is None
+                or len(combinations) >= self.groupIdCacheSize
+                or self._v_groupIdPrefix != self.prefix):
+            combinations = self._v_groupIdCombinations = {}
+            self._v_groupIds = {}
+            self._v_groupIdPrefix = self.prefix
+        prefixed = combinations.get(ids)
+        if prefixed is None:
+            table = self._v_groupIds
+            prefixed = []
+            for id in ids:
+                prefixedId = table.get(id)
+                if prefixedId is None:
+                    prefixedId = table[id] = self.prefix + id
+                prefixed.append(prefixedId)
+            prefixed = combinations[ids] = tuple(prefixed)
+        return prefixed
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._pluginsChanged()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._pluginsChanged()
+
+    def _pluginsChanged(self):
+        # Modify the PAU itself, so that the group folders computed in
+        # other processes are discarded too.
+        self._p_changed = True
+        self._v_groupFolders = None
+
+    def sweep(self, limit=100, now=None):
+        swept = self._sweep(limit, now)
+        _countSwept(swept)
+        return swept
+
+    def _sweep(self, limit, now):
+        swept = {}
+        seen = set()
+        for name, plugin in itertools.chain(self.getCredentialsPlugins(),
+                                            self.getAuthenticatorPlugins()):
+            if limit is not None and limit <= 0:
+                break
+            if (not interfaces.ISweepablePlugin.providedBy(plugin)
+                    or id(plugin) in seen):
+                continue
+            seen.add(id(plugin))
+            count = plugin.sweep(limit, now)
+            swept[name] = count
+            if limit is not None:
+                limit -= count
+        return swept
+
+    def _sweepOpportunistically(self):
+        now = time.time()
+        jar = self._p_jar
+        if jar is None:
+            # Not stored in a database, so the PAU itself lives per process
+            if now - getattr(self, '_v_lastSweep', 0) < self.sweepInterval:
+                return
+            self._v_lastSweep = now
+            self.sweep(self.sweepLimit, now)
+            return
+        db = jar.db()
+        key = (id(db), self._p_oid)
+        with _swept_lock:
+            if now - _lastSweeps.get(key, 0) < self.sweepInterval:
+                return
+            _lastSweeps[key] = now
+        # Sweep through a connection of its own, so that the transaction of
+        # the request stays read-only and conflicts don't fail the request.
+        manager = transaction.TransactionManager()
+        connection = db.open(transaction_manager=manager)
+        try:
+            manager.begin()
+            swept = connection.get(self._p_oid)._sweep(self.sweepLimit, now)
+            manager.commit()
+        except TransientError:
+            # Another process swept or changed the same entries; they are
+            # left to a later sweep.
+            manager.abort()
+            return
+        except Exception:
+            manager.abort()
+            logger.exception('Sweeping expired state failed')
+            return
+        finally:
+            connection.close()
+        _countSwept(swept)
+
+    def _credentialsCache(self):
+        # Authentications are shared by all connections to the database
+        # holding the PAU, or kept on the PAU if it isn't stored in one.
+        # Callers hold _credentials_lock.
+        jar = self._p_jar
+        owner = self if jar is None else jar.db()
+        caches = _credentialsCaches.get(owner)
+        if caches is None:
+            caches = _credentialsCaches[owner] = {}
+        cache = caches.get(self._p_oid)
+        if cache is None:
+            cache = caches[self._p_oid] = {}
+        return cache
+
+    def _cachedInfo(self, key, authenticatorPlugins, now):
+        with _credentials_lock:
+            entry = self._credentialsCache().get(key)
+        if entry is None:
+            return None
+        name, info, stamp, expires = entry
+        authplugin = dict(authenticatorPlugins).get(name)
+        if (expires <= now
+                or authplugin is None
+                or _credentialsStamp(authplugin, info) != stamp):
+            with _credentials_lock:
+                self._credentialsCache().pop(key, None)
+            return None
+        # The remembered info may be used by other threads at the same
+        # time, and its plugins may belong to another connection.
+        info = copy.copy(info)
+        info.authenticatorPlugin = authplugin
+        return info
+
+    def _cacheInfo(self, key, name, info, lifetime, now):
+        stamp = _credentialsStamp(info.authenticatorPlugin, info)
+        info = copy.copy(info)
+        info.credentialsPlugin = info.authenticatorPlugin = None
+        with _credentials_lock:
+            cache = self._credentialsCache()
+            if len(cache) >= self.credentialsCacheSize:
+                cache.clear()
+            cache[key] = (name, info, stamp, now + lifetime)
+
     def authenticate(self, request):
-        authenticatorPlugins = [p for n, p in self.getAuthenticatorPlugins()]
+        if self.sweepLimit:
+            self._sweepOpportunistically()
+        authenticatorPlugins = list(self.getAuthenticatorPlugins())
         for name, credplugin in self.getCredentialsPlugins():
             credentials = credplugin.extractCredentials(request)
-            for authplugin in authenticatorPlugins:
+            key = None
+            lifetime = getattr(credplugin, 'credentialsCacheLifetime', None)
+            if lifetime:
+                key = _credentialsKey(name, credentials)
+            if key is not None:
+                now = time.time()
+                info = self._cachedInfo(key, authenticatorPlugins, now)
+                if info is not None:
+                    info.credentialsPlugin = credplugin
+                    return self._authenticatedPrincipal(info, request)
+            for authname, authplugin in authenticatorPlugins:
                 if authplugin is None:
                     continue
                 info = authplugin.authenticateCredentials(credentials)
@@ -65,14 +373,55 @@ class PluggableAuthentication(BTreeContainer):
                     continue
                 info.credentialsPlugin = credplugin
                 info.authenticatorPlugin = authplugin
-                principal = component.getMultiAdapter(
-                    (info, request),
-                    interfaces.IAuthenticatedPrincipalFactory)(self)
-                principal.id = self.prefix + info.id
-                return principal
+                if key is not None:
+                    self._cacheInfo(key, authname, info, lifetime, now)
+                return self._authenticatedPrincipal(info, request)
         return None
 
+    def _principalFactory(self, provided, *objects):
+        # Like getMultiAdapter(objects, provided), but remembers the adapter
+        # factory per interfaces provided by the objects until the adapter
+        # registry or one of its bases changes.
+        adapters = component.getSiteManager().adapters
+        generation = factories.registryGeneration(adapters)
+        specs = tuple(map(providedBy, objects))
+        key = (provided, ) + specs
+        cache = getattr(self, '_v_principalFactories', None)
+        if cache is None:
+            cache = self._v_principalFactories = {}
+        entry = cache.get(key)
+        if (entry is not None and entry[0] is adapters
+                and entry[1] == generation):
+            factory = entry[2]
+        else:
+            factory = adapters.lookup(specs, provided)
+            if factory is not None and generation is not None:
+                cache[key] = (adapters, generation, factory)
+        if factory is not None:
+            adapter = factory(*objects)
+            if adapter is not None:
+                return adapter
+        # Let the component architecture report the missing adapter
+        if len(objects) == 1:
+            return provided(objects[0])
+        return component.getMultiAdapter(objects, provided)
+
+    def _authenticatedPrincipal(self, info, request):
+        principal = self._principalFactory(
+            interfaces.IAuthenticatedPrincipalFactory, info, request)(self)
+        principal.id = self.prefix + info.id
+        return principal
+
     def getPrincipal(self, id):
+        memo = factories.requestMemo(self)
+        if memo is None:
+            return self._getPrincipal(id)
+        principal = memo.get(id)
+        if principal is None:
+            principal = memo[id] = self._getPrincipal(id)
+        return principal
+
+    def _getPrincipal(self, id):
         if not id.startswith(self.prefix):
             next = queryNextUtility(self, IAuthentication)
             if next is None:
@@ -85,7 +434,12 @@ class PluggableAuthentication(BTreeContainer):
                 continue
             info.credentialsPlugin = None
             info.authenticatorPlugin = authplugin
-            principal = interfaces.IFoundPrincipalFactory(info)(self)
+            factory = self._principalFactory(
+                interfaces.IFoundPrincipalFactory, info)
+            if self.lazyPrincipals:
+                return factories.LazyPrincipal(
+                    self.prefix + info.id, info, factory, self)
+            principal = factory(self)
             principal.id = self.prefix + info.id
             return principal
         next = queryNextUtility(self, IAuthentication)
@@ -15,16 +15,156 @@
 """
 __docformat__ = "reStructuredText"
 
+import weakref
+from operator import attrgetter
+
+import zope.event
 from zope.authentication.interfaces import IAuthentication
+from zope.component.event import dispatch
 from zope.event import notify
+from zope.interface import implementedBy
 from zope.publisher.interfaces import IRequest
 from zope.security.interfaces import IGroupClosureAwarePrincipal as IPrincipal
+from zope.security.management import queryInteraction
 
 from zope import component
 from zope import interface
 from zope.pluggableauth import interfaces
 
 
+_generation = attrgetter('_generation')
+
+
+def registryGeneration(adapters):
+    """Return a value that changes when `adapters` or its bases change.
+
+    This is what the verifying lookups of zope.interface use to invalidate
+    their caches.  None is returned for registries without generations.
+    """
+    try:
+        return list(map(_generation, adapters.ro))
+    except AttributeError:
+        return None
+
+
+def requestMemo(key):
+    """Return a dictionary for remembering values during the current request.
+
+    There is one dictionary per `key`.  The dictionaries are kept in the
+    annotations of the request taking part in the current security
+    interaction.  None is returned if there is no
+    such request:
+
+      >>> print(requestMemo('principals'))
+      None
+
+      >>> from zope.publisher.base import TestRequest
+      >>> from zope.security.management import newInteraction, endInteraction
+      >>> request = TestRequest('/')
+      >>> newInteraction(request)
+      >>> requestMemo('principals')['bob'] = 'Bob'
+      >>> requestMemo('principals')
+      {'bob': 'Bob'}
+      >>> endInteraction()
+
+    """
+    interaction = queryInteraction()
+    if interaction is None:
+        return None
+    for participation in interaction.participations:
+        annotations = getattr(participation, 'annotations', None)
+        if annotations is not None:
+            memo = annotations.get(__name__)
+            if memo is None:
+                memo = annotations[__name__] = {}
+            values = memo.get(key)
+            if values is None:
+                values = memo[key] = {}
+            return values
+    return None
+
+
+def forgetRequestMemo():
+    """Forget the values remembered during the current request.
+
+    This is needed when remembered values, like principals and their
+    groups, become stale:
+
+      >>> from zope.publisher.base import TestRequest
+      >>> from zope.security.management import newInteraction, endInteraction
+      >>> newInteraction(TestRequest('/'))
+      >>> requestMemo('principals')['bob'] = 'Bob'
+      >>> forgetRequestMemo()
+      >>> requestMemo('principals')
+      {}
+      >>> endInteraction()
+      >>> forgetRequestMemo()
+
+    """
+    interaction = queryInteraction()
+    if interaction is None:
+        return
+    for participation in interaction.participations:
+        annotations = getattr(participation, 'annotations', None)
+        if annotations is not None:
+            annotations.pop(__name__, None)
+
+
+# adapter registry -> {event class: (generation, handlers)}
+_handlers = weakref.WeakKeyDictionary()
+
+
+def notifyPrincipalCreated(eventClass, *args):
+    """Notify the subscribers of a principal created event.
+
+    This does what ``notify(eventClass(*args))`` does.  As principals are
+    created all the time, the handlers registered for the event class are
+    remembered until the component registry changes, and the event isn't
+    created at all if there are none:
+
+      >>> from zope.pluggableauth.interfaces import FoundPrincipalCreated
+      >>> class Event(FoundPrincipalCreated):
+      ...     def __init__(self, *args):
+      ...         print('Event created')
+      ...         super().__init__(*args)
+      >>> notifyPrincipalCreated(Event, None, Principal('bob'), None)
+      Event created
+      >>> from zope.component import eventtesting
+      >>> eventtesting.getEvents()
+      [<...Event object at ...>]
+
+      >>> gsm = component.getGlobalSiteManager()
+      >>> gsm.unregisterHandler(eventtesting.events.append, (None, ))
+      True
+      >>> notifyPrincipalCreated(Event, None, Principal('bob'), None)
+
+      >>> gsm.registerHandler(eventtesting.events.append, (None, ))
+      >>> notifyPrincipalCreated(Event, None, Principal('bob'), None)
+      Event created
+
+    """
+    subscribers = zope.event.subscribers
+    if not subscribers:
+        return
+    if len(subscribers) > 1 or subscribers[0] is not dispatch:
+        notify(eventClass(*args))
+        return
+    adapters = component.getSiteManager().adapters
+    generation = registryGeneration(adapters)
+    cache = _handlers.get(adapters)
+    if cache is None:
+        cache = _handlers[adapters] = {}
+    entry = cache.get(eventClass)
+    if entry is None or generation is None or entry[0] != generation:
+        handlers = adapters.subscriptions([implementedBy(eventClass)], None)
+        entry = cache[eventClass] = (generation, handlers)
+    handlers = entry[1]
+    if handlers:
+        event = eventClass(*args)
+        for handler in handlers:
+            handler(event)
+
+
 @interface.implementer(interfaces.IPrincipalInfo)
 class PrincipalInfo:
     """An implementation of IPrincipalInfo used by the principal folder.
@@ -43,8 +183,17 @@ class PrincipalInfo:
       >>> info.description
       'An over-used term.'
 
+    Principal infos are created for every authentication, so the common
+    attributes are kept in slots.  Other attributes can still be set:
+
+      >>> info.authenticatorPlugin = None
+      >>> info.scopes = ('read',)
+
     """
 
+    __slots__ = ('id', 'login', 'title', 'description',
+                 'credentialsPlugin', 'authenticatorPlugin', '__dict__')
+
     def __init__(self, id, login, title, description):
         self.id = id
         self.login = login
@@ -148,19 +297,89 @@ class Principal:
       ['content_administrators', 'reviewers', 'editors', 'creators',
        'user_managers', 'zope_3_project', 'list_administrators',
        'zope_3_list_admin', 'zpug']
+
+    During a request, the closure is computed once and remembered in the
+    request, as long as the `groups` don't change:
+
+      >>> from zope.publisher.base import TestRequest
+      >>> from zope.security.management import newInteraction, endInteraction
+      >>> newInteraction(TestRequest('/'))
+      >>> p.allGroups is p.allGroups
+      True
+      >>> p.allGroups # doctest: +NORMALIZE_WHITESPACE
+      ('content_administrators', 'reviewers', 'editors', 'creators',
+       'user_managers', 'zope_3_project', 'list_administrators',
+       'zope_3_list_admin', 'zpug')
+      >>> p.groups.remove('zpug')
+      >>> 'zpug' in p.allGroups
+      False
+      >>> endInteraction()
+
+    `allGroupSet` has the same groups as a set, for membership tests.
+    `freezeGroups` computes the closure once and keeps it for both:
+
+      >>> 'editors' in p.allGroupSet, 'martians' in p.allGroupSet
+      (True, False)
+      >>> p.freezeGroups()
+      >>> p.allGroupSet is p.allGroupSet, p.allGroups is p.allGroups
+      (True, True)
+      >>> p.groups.append('martians')
+      >>> 'martians' in p.allGroupSet, 'martians' in p.allGroups
+      (False, False)
+
+    Principals are created for every request, so their attributes are kept
+    in slots.  Subscribers may still set other attributes.
     """
 
+    __slots__ = ('id', 'title', 'description', 'groups', '_allGroups',
+                 '_allGroupSet', '__dict__')
+
     def __init__(self, id, title='', description=''):
         self.id = id
         self.title = title
         self.description = description
         self.groups = []
+        self._allGroups = None
+        self._allGroupSet = None
+
+    @property
+    def allGroupSet(self):
+        """The groups of `allGroups` as a frozenset.
+
+        If `freezeGroups` was called, the set computed then is returned.
+        """
+        groups = self._allGroupSet
+        if groups is None:
+            groups = frozenset(self.allGroups)
+        return groups
+
+    def freezeGroups(self):
+        """Compute `allGroups` and `allGroupSet` once, for all later uses.
+
+        Later changes of the groups are not reflected in either.
+        """
+        groups = tuple(self.allGroups)
+        self._allGroups = groups
+        self._allGroupSet = frozenset(groups)
 
     def __repr__(self):
         return 'Principal(%r)' % self.id
 
     @property
     def allGroups(self):
+        closure = self._allGroups
+        if closure is not None:
+            return closure
+        memo = requestMemo('allGroups')
+        if memo is None:
+            return self._groupClosure()
+        key = (self.id, tuple(self.groups))
+        closure = memo.get(key)
+        if closure is None:
+            closure = memo[key] = tuple(self._groupClosure())
+        return closure
+
+    def _groupClosure(self):
         if self.groups:
             seen = set()
             principals = component.getUtility(IAuthentication)
@@ -178,6 +397,79 @@ class Principal:
                         stack.append(iter(group.groups))
 
 
+class LazyPrincipal:
+    """A principal that is only created when more than its title is needed.
+
+    A lazy principal is created with an id, a principal info and a
+    principal factory, to be called with a pluggable-authentication object:
+
+      >>> info = PrincipalInfo('users.sam', 'sam', 'Sam', 'A site user.')
+      >>> class Auth:
+      ...     prefix = 'auth.'
+      >>> principal = LazyPrincipal('auth.users.sam', info,
+      ...                           FoundPrincipalFactory(info), Auth())
+      >>> principal
+      Principal('auth.users.sam')
+
+    The id, title and description are taken from the info, without calling
+    the factory:
+
+      >>> principal.id, principal.title, principal.description
+      ('auth.users.sam', 'Sam', 'A site user.')
+
+      >>> from zope.component.eventtesting import getEvents
+      >>> getEvents(interfaces.IFoundPrincipalCreated)
+      []
+
+    Anything else, like the groups or the interfaces provided, is taken from
+    the principal created by the factory, which is created only once.  So
+    the subscribers to the events fired by the factory only run then:
+
+      >>> principal.groups
+      []
+      >>> len(getEvents(interfaces.IFoundPrincipalCreated))
+      1
+      >>> IPrincipal.providedBy(principal)
+      True
+      >>> list(principal.allGroups)
+      []
+      >>> len(getEvents(interfaces.IFoundPrincipalCreated))
+      1
+
+    """
+
+    __slots__ = ('id', 'title', 'description',
+                 '_factory', '_authentication', '_principal')
+
+    def __init__(self, id, info, factory, authentication):
+        self.id = id
+        self.title = info.title
+        self.description = info.description
+        self._factory = factory
+        self._authentication = authentication
+        self._principal = None
+
+    def _resolve(self):
+        principal = self._principal
+        if principal is None:
+            principal = self._factory(self._authentication)
+            principal.id = self.id
+            self._principal = principal
+        return principal
+
+    @property
+    def __providedBy__(self):
+        return interface.providedBy(self._resolve())
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return 'Principal(%r)' % self.id
+
+
 @component.adapter(interfaces.IPrincipalInfo, IRequest)
 @interface.implementer(interfaces.IAuthenticatedPrincipalFactory)
 class AuthenticatedPrincipalFactory:
@@ -226,10 +518,33 @@ class AuthenticatedPrincipalFactory:
     Listeners can subscribe to this event to perform additional operations
     when the authenticated principal is created.
 
+    If `freezeGroups` is set on the factory or on the pluggable
+    authentication, the closure of the groups the listeners gave the
+    principal is computed right away and kept as `allGroups` and
+    `allGroupSet` (see `Principal.freezeGroups`), so that security checks
+    don't need to walk the groups again:
+
+      >>> class FrozenGroupsPrincipalFactory(AuthenticatedPrincipalFactory):
+      ...     freezeGroups = True
+      >>> principal = FrozenGroupsPrincipalFactory(info, request)(auth)
+      >>> principal.allGroups, principal.allGroupSet
+      ((), frozenset())
+      >>> principal.allGroupSet is principal.allGroupSet
+      True
+
+      >>> auth.freezeGroups = True
+      >>> principal = AuthenticatedPrincipalFactory(info, request)(auth)
+      >>> principal.groups.append('martians')
+      >>> principal.allGroups, principal.allGroupSet
+      ((), frozenset())
+      >>> del auth.freezeGroups
+
     For information on how factories are used in the authentication process,
     see README.txt.
     """
 
+    freezeGroups = False
+
     def __init__(self, info, request):
         self.info = info
         self.request = request
@@ -238,8 +553,11 @@ class AuthenticatedPrincipalFactory:
         principal = Principal(authentication.prefix + self.info.id,
                               self.info.title,
                               self.info.description)
-        notify(interfaces.AuthenticatedPrincipalCreated(
-            authentication, principal, self.info, self.request))
+        notifyPrincipalCreated(interfaces.AuthenticatedPrincipalCreated,
+                               authentication, principal, self.info,
+                               self.request)
+        if self.freezeGroups or getattr(authentication, 'freezeGroups', False):
+            principal.freezeGroups()
         return principal
 
 
@@ -297,6 +615,6 @@ class FoundPrincipalFactory:
         principal = Principal(authentication.prefix + self.info.id,
                               self.info.title,
                               self.info.description)
-        notify(interfaces.FoundPrincipalCreated(authentication,
-                                                principal, self.info))
+        notifyPrincipalCreated(interfaces.FoundPrincipalCreated,
+                               authentication, principal, self.info)
         return principal
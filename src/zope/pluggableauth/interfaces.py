@@ -84,9 +84,32 @@ class IPluggableAuthentication(ILogout, IContainer):
         readonly=True,
     )
 
+    def getGroupFolders():
+        """Return a sequence of (group folder, group prefix) pairs.
+
+        The group folders are the authenticator plugins providing
+        `zope.pluggableauth.plugins.groupfolder.IGroupFolder`, in order.  The
+        group prefix is the prefix of the ids of their groups, including
+        the prefix of the IPluggableAuthentication.
+        """
+
+    def prefixGroupIds(ids):
+        """Return a tuple of the group ids with the prefix added.
+
+        Equal results may be the same (shared) tuple.
+        """
+
     def logout(request):
         """Performs a logout by delegating to its authenticator plugins."""
 
+    def sweep(limit=100, now=None):
+        """Removes expired state from the plugins.
+
+        Calls the `ISweepablePlugin` credentials and authenticator plugins
+        in turn until `limit` entries were removed in total.  Returns a
+        mapping of plugin names to the number of entries removed.
+        """
+
 
 class ICredentialsPlugin(IPlugin):
     """Handles credentials extraction and challenges per request."""
@@ -103,6 +126,24 @@ class ICredentialsPlugin(IPlugin):
         protocol.
         """)
 
+    credentialsCacheLifetime = zope.interface.Attribute(
+        """Number of seconds the PAU may reuse an authentication (optional).
+
+        If set, the pluggable authentication utility remembers which
+        principal the login and password extracted by the plugin were
+        authenticated as, and skips the authenticator plugins when the same
+        credentials are presented again within that time.
+
+        Authenticators providing a `getCredentialsStamp(id)` method, which
+        returns a value that changes with the login information of the
+        principal, invalidate the remembered authentications of that
+        principal only.  Failing that, authenticators providing a
+        `getGeneration` method invalidate all of their remembered
+        authentications by increasing their generation.  Authentications
+        by other authenticators are only discarded when the lifetime is
+        over, so a changed password is accepted until then.
+        """)
+
     def extractCredentials(request):
         """Ties to extract credentials from a request.
 
@@ -148,6 +189,21 @@ class IAuthenticatorPlugin(IPlugin):
         """
 
 
+class ISweepablePlugin(IPlugin):
+    """A plugin keeping state that expires."""
+
+    def sweep(limit=None, now=None):
+        """Removes expired state.
+
+        At most `limit` entries are removed, if `limit` is not None. `now`
+        is the current time in seconds since the epoch, and defaults to
+        the actual time.  Returns the number of entries removed.
+
+        Sweeps may run concurrently in several processes, so they should
+        start at a random expired entry rather than at the oldest one.
+        """
+
+
 class IPrincipalInfo(zope.interface.Interface):
     """Minimal information about a principal."""
 
@@ -0,0 +1,245 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""API keys for machine clients.
+"""
+__docformat__ = 'restructuredtext'
+
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+import persistent
+import zope.container.contained
+from BTrees.OOBTree import OOBTree
+from zope.component import adapter
+from zope.interface import Interface
+from zope.interface import implementer
+from zope.schema import Int
+
+from zope.pluggableauth.interfaces import IAuthenticatedPrincipalCreated
+from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+
+
+class IAPIKeyAuthenticator(Interface):
+    """Authenticator plugin for API keys."""
+
+    lifetime = Int(
+        title='Lifetime',
+        description="Number of seconds new keys are valid, 0 for keys that"
+        " don't expire.",
+        default=0)
+
+
+class APIKey:
+    """The stored part of an API key.
+
+    The key itself is not stored, only a keyed hash of its secret part.
+    """
+
+    def __init__(self, keyId, digest, principalId, scopes, expires):
+        self.keyId = keyId
+        self.digest = digest
+        self.principalId = principalId
+        self.scopes = scopes
+        self.expires = expires
+
+    def __repr__(self):
+        return 'APIKey(%r)' % self.keyId
+
+
+@implementer(IAuthenticatorPlugin, IAPIKeyAuthenticator)
+class APIKeyAuthenticatorPlugin(persistent.Persistent,
+                                zope.container.contained.Contained):
+    """Authenticates the API keys it handed out.
+
+    Keys are added for principals provided by the other authenticator
+    plugins of the pluggable authentication utility, optionally limited to
+    some scopes:
+
+      >>> from zope.pluggableauth.factories import PrincipalInfo
+      >>> @implementer(IAuthenticatorPlugin)
+      ... class Principals:
+      ...     def authenticateCredentials(self, credentials):
+      ...         raise AssertionError('Passwords are not checked')
+      ...     def principalInfo(self, id):
+      ...         if id == 'users.bob':
+      ...             return PrincipalInfo(id, 'bob', 'Bob', '')
+
+      >>> class PAU:
+      ...     def getAuthenticatorPlugins(self):
+      ...         return [('keys', plugin), ('users', Principals())]
+
+      >>> plugin = APIKeyAuthenticatorPlugin()
+      >>> plugin.__parent__ = PAU()
+      >>> token = plugin.addKey('users.bob', scopes=('read',))
+
+    The key consists of a public key id and a secret part.  Only a keyed
+    hash (HMAC-SHA256) of the secret part is stored, under the key id:
+
+      >>> keyId, secret = token.split('.')
+      >>> plugin.getKey(keyId)
+      APIKey('...')
+      >>> secret in repr(plugin.getKey(keyId).__dict__)
+      False
+
+    Validating a key costs one BTree lookup and one HMAC computation.  The
+    scopes of the key are added to the principal information:
+
+      >>> info = plugin.authenticateCredentials({'token': token})
+      >>> info
+      PrincipalInfo('users.bob')
+      >>> sorted(info.scopes)
+      ['read']
+      >>> print(plugin.authenticateCredentials({'token': keyId + '.guess'}))
+      None
+      >>> print(plugin.authenticateCredentials({'token': 'garbage'}))
+      None
+
+    Keys expire after `lifetime` seconds, if set:
+
+      >>> plugin.lifetime = 3600
+      >>> token = plugin.addKey('users.bob', now=1000)
+      >>> plugin.authenticateCredentials({'token': token}, now=4599)
+      PrincipalInfo('users.bob')
+      >>> print(plugin.authenticateCredentials({'token': token}, now=4600))
+      None
+
+    Keys can be revoked by their id:
+
+      >>> len(plugin)
+      2
+      >>> plugin.revokeKey(keyId)
+      True
+      >>> plugin.revokeKey(keyId)
+      False
+      >>> print(plugin.authenticateCredentials(
+      ...     {'token': keyId + '.' + secret}))
+      None
+      >>> len(plugin)
+      1
+
+    Keys of unknown principals and other credentials are not authenticated,
+    and the plugin does not provide principals itself:
+
+      >>> token = plugin.addKey('users.tim')
+      >>> print(plugin.authenticateCredentials({'token': token}))
+      None
+      >>> print(plugin.authenticateCredentials(
+      ...     {'login': 'bob', 'password': 'secret'}))
+      None
+      >>> print(plugin.principalInfo('users.bob'))
+      None
+
+    """
+
+    lifetime = 0
+
+    def __init__(self):
+        self.secret = os.urandom(32)
+        # key id -> APIKey
+        self._keys = OOBTree()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _digest(self, secret):
+        return hmac.new(self.secret, secret.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def addKey(self, principalId, scopes=(), now=None):
+        """Add a key for `principalId` and return it.
+
+        The returned key is not stored and cannot be retrieved later.
+        """
+        if now is None:
+            now = time.time()
+        expires = int(now) + self.lifetime if self.lifetime else None
+        keyId = secrets.token_hex(8)
+        while keyId in self._keys:
+            keyId = secrets.token_hex(8)
+        secret = secrets.token_urlsafe(32)
+        self._keys[keyId] = APIKey(keyId, self._digest(secret), principalId,
+                                   frozenset(scopes), expires)
+        return keyId + '.' + secret
+
+    def getKey(self, keyId):
+        """Return the stored `APIKey` for `keyId` or None."""
+        return self._keys.get(keyId)
+
+    def revokeKey(self, keyId):
+        """Remove the key with `keyId`, return whether it existed."""
+        return self._keys.pop(keyId, None) is not None
+
+    def authenticateCredentials(self, credentials, now=None):
+        """Return principal info if the credentials hold a valid key."""
+        if not isinstance(credentials, dict):
+            return None
+        token = credentials.get('token')
+        if not token:
+            return None
+        keyId, sep, secret = token.partition('.')
+        key = self._keys.get(keyId)
+        if key is None or not hmac.compare_digest(key.digest,
+                                                  self._digest(secret)):
+            return None
+        if key.expires is not None:
+            if now is None:
+                now = time.time()
+            if key.expires <= now:
+                return None
+        for name, plugin in self.__parent__.getAuthenticatorPlugins():
+            if plugin is self:
+                continue
+            info = plugin.principalInfo(key.principalId)
+            if info is not None:
+                info.scopes = key.scopes
+                return info
+        return None
+
+    def principalInfo(self, id):
+        return None
+
+
+@adapter(IAuthenticatedPrincipalCreated)
+def addScopesSubscriber(event):
+    """Copy the scopes of an API key to the principal.
+
+      >>> from zope.pluggableauth.factories import Principal, PrincipalInfo
+      >>> from zope.pluggableauth.interfaces import (
+      ...     AuthenticatedPrincipalCreated)
+      >>> info = PrincipalInfo('users.bob', 'bob', 'Bob', '')
+      >>> info.authenticatorPlugin = APIKeyAuthenticatorPlugin()
+      >>> info.scopes = frozenset(['read'])
+      >>> principal = Principal('users.bob')
+      >>> addScopesSubscriber(AuthenticatedPrincipalCreated(
+      ...     None, principal, info, 'request'))
+      >>> principal.scopes
+      frozenset({'read'})
+
+    Principals authenticated otherwise are left alone:
+
+      >>> info.authenticatorPlugin = object()
+      >>> principal = Principal('users.bob')
+      >>> addScopesSubscriber(AuthenticatedPrincipalCreated(
+      ...     None, principal, info, 'request'))
+      >>> hasattr(principal, 'scopes')
+      False
+
+    """
+    info = event.info
+    if isinstance(getattr(info, 'authenticatorPlugin', None),
+                  APIKeyAuthenticatorPlugin):
+        event.principal.scopes = info.scopes
@@ -23,6 +23,19 @@ from zope.pluggableauth import interfaces
 
 @implementer(interfaces.ICredentialsPlugin)
 class FTPCredentialsPlugin:
+    """Credentials plugin for FTP requests.
+
+    An FTP client sends the same credentials with every command of a
+    connection, so the pluggable authentication utility may reuse the
+    authentication of a login and password for a while instead of checking
+    the password again for each command:
+
+      >>> FTPCredentialsPlugin.credentialsCacheLifetime
+      300
+
+    """
+
+    credentialsCacheLifetime = 300
 
     def extractCredentials(self, request):
         """Extracts the FTP credentials from a request.
@@ -12,12 +12,15 @@
 #
 ##############################################################################
 """Zope Groups Folder implementation."""
+import itertools
+
 import BTrees.OOBTree
 import persistent
 import zope.authentication.principal
 import zope.container.constraints
 import zope.container.interfaces
 import zope.location.interfaces
+from BTrees.Length import Length
 from zope.authentication.interfaces import IAuthenticatedGroup
 from zope.authentication.interfaces import IAuthentication
 from zope.authentication.interfaces import IEveryoneGroup
@@ -34,6 +37,7 @@ from zope import event
 from zope import interface
 from zope import schema
 from zope.pluggableauth import factories
+from zope.pluggableauth.interfaces import FoundPrincipalCreated
 from zope.pluggableauth.interfaces import IAuthenticatorPlugin
 from zope.pluggableauth.interfaces import IFoundPrincipalCreated
 from zope.pluggableauth.interfaces import IGroupAdded
@@ -83,6 +87,15 @@ class IGroupFolder(zope.container.interfaces.IContainer):
     def getPrincipalsForGroup(groupid):
         """Get principals which belong to the group"""
 
+    def getAllMembersOfGroup(groupid, start=None, batch_size=None,
+                             after=None, principalsOnly=False):
+        """Get principals which belong to the group, also through other groups
+
+        The ids are returned in sorted order, optionally only `batch_size`
+        of them, after the first `start` or after the id `after`.  With
+        `principalsOnly`, the groups of the folder among them are left out.
+        """
+
 
 class IGroupContained(zope.location.interfaces.IContained):
 
@@ -135,6 +148,9 @@ class GroupInfo:
 
     """
 
+    __slots__ = ('id', '_information',
+                 'credentialsPlugin', 'authenticatorPlugin', '__dict__')
+
     def __init__(self, id, information):
         self.id = id
         self._information = information
@@ -159,16 +175,102 @@ class GroupInfo:
         return 'GroupInfo(%r)' % self.id
 
 
+@implementer(IMemberAwareGroup)
+class GroupPrincipal(factories.Principal):
+    """A group principal made from a group info.
+
+    It provides `IMemberAwareGroup` through its class and reads and writes
+    the members through the group info:
+
+      >>> from zope.interface.verify import verifyObject
+      >>> info = GroupInfo('groups.managers', GroupInformation('Managers'))
+      >>> principal = GroupPrincipal('auth.groups.managers', info)
+      >>> verifyObject(IMemberAwareGroup, principal)
+      True
+      >>> principal.title
+      'Managers'
+      >>> principal.setMembers(('joe', 'jane'))
+      >>> principal.getMembers()
+      ('joe', 'jane')
+      >>> info.members
+      ('joe', 'jane')
+
+    """
+
+    __slots__ = ('_info',)
+
+    def __init__(self, id, info):
+        super().__init__(id, info.title, info.description)
+        self._info = info
+
+    def getMembers(self):
+        return self._info.members
+
+    def setMembers(self, value):
+        self._info.members = value
+
+
+@component.adapter(IGroupPrincipalInfo)
+class FoundGroupFactory(factories.FoundPrincipalFactory):
+    """Creates 'found' group principals.
+
+      >>> info = GroupInfo('groups.managers', GroupInformation('Managers'))
+      >>> class Auth:
+      ...     prefix = 'auth.'
+      >>> principal = FoundGroupFactory(info)(Auth())
+      >>> principal
+      Principal('auth.groups.managers')
+      >>> IMemberAwareGroup.providedBy(principal)
+      True
+
+    """
+
+    def __call__(self, authentication):
+        principal = GroupPrincipal(authentication.prefix + self.info.id,
+                                   self.info)
+        factories.notifyPrincipalCreated(FoundPrincipalCreated,
+                                         authentication, principal,
+                                         self.info)
+        return principal
+
+
 @interface.implementer(IAuthenticatorPlugin, IQuerySchemaSearch, IGroupFolder)
 class GroupFolder(BTreeContainer):
 
     schema = IGroupSearchCriteria
 
+    # Counts changes of the groups and their members, see `getGeneration`
+    _generation = None
+
+    # Folders created before the members index existed compute the members
+    # of groups on every call until `reindexMembers` is called.
+    _members = None
+
+    # Maximum number of principals `getMembershipBits` remembers (per
+    # connection, and until the folder is ghosted)
+    membershipCacheSize = 10000
+
     def __init__(self, prefix=''):
         super().__init__()
         self.prefix = prefix
         # __inversemapping is used to map principals to groups
         self.__inverseMapping = BTrees.OOBTree.OOBTree()
+        self._generation = Length()
+        # group name -> ids of all members, also through other groups
+        self._members = BTrees.OOBTree.OOBTree()
+
+    def _changed(self):
+        if self._generation is None:
+            self._generation = Length()
+        self._generation.change(1)
+        # Principals remembered during the request have stale groups now
+        factories.forgetRequestMemo()
+
+    def getGeneration(self):
+        """Return a number that increases whenever a group changes."""
+        if self._generation is None:
+            return 0
+        return self._generation()
 
     def __setitem__(self, name, value):
         BTreeContainer.__setitem__(self, name, value)
@@ -184,23 +286,41 @@ class GroupFolder(BTreeContainer):
     def __delitem__(self, name):
         value = self[name]
         group_id = self._groupid(value)
-        self._removePrincipalsFromGroup(value.principals, group_id)
+        ancestors = self._ancestors(name)
+        self._removePrincipalsFromGroup(value.principals, group_id,
+                                        reindex=False)
         if value.principals:
             event.notify(
                 PrincipalsRemovedFromGroup(
                     value.principals, self.__parent__.prefix + group_id))
         BTreeContainer.__delitem__(self, name)
+        self._reindexMembers(ancestors)
 
     def _groupid(self, group):
         return self.prefix + group.__name__
 
     def _addPrincipalsToGroup(self, principal_ids, group_id):
+        self._changed()
         for principal_id in principal_ids:
             self.__inverseMapping[principal_id] = (
                 self.__inverseMapping.get(principal_id, ())
                 + (group_id,))
-
-    def _removePrincipalsFromGroup(self, principal_ids, group_id):
+        if self._members is None or not principal_ids:
+            return
+        added = set(principal_ids)
+        for principal_id in principal_ids:
+            name = self._memberGroup(principal_id)
+            if name is not None:
+                added.update(self._members.get(name, ()))
+        for name in self._ancestors(group_id[len(self.prefix):]):
+            members = self._members.get(name)
+            if members is None:
+                members = self._members[name] = BTrees.OOBTree.OOTreeSet()
+            members.update(added)
+
+    def _removePrincipalsFromGroup(self, principal_ids, group_id,
+                                   reindex=True):
+        self._changed()
         for principal_id in principal_ids:
             groups = self.__inverseMapping.get(principal_id)
             if groups is None:
@@ -210,6 +330,67 @@ class GroupFolder(BTreeContainer):
                 self.__inverseMapping[principal_id] = new
             else:
                 del self.__inverseMapping[principal_id]
+        if reindex and principal_ids:
+            # Members may still belong through other groups, so the groups
+            # containing the group are computed again.
+            self._reindexMembers(self._ancestors(group_id[len(self.prefix):]))
+
+    def _memberGroup(self, principal_id):
+        # Name of the group of the folder with id `principal_id`, or None
+        prefix = getattr(self.__parent__, 'prefix', '') + self.prefix
+        if principal_id.startswith(prefix):
+            name = principal_id[len(prefix):]
+            if name in self:
+                return name
+        return None
+
+    def _ancestors(self, name):
+        # Names of the group and of the groups of the folder containing it,
+        # directly or through other groups
+        prefix = getattr(self.__parent__, 'prefix', '') + self.prefix
+        names = [name]
+        seen = {name}
+        for name in names:
+            for group_id in self.getGroupsForPrincipal(prefix + name):
+                name = group_id[len(self.prefix):]
+                if name not in seen and name in self:
+                    seen.add(name)
+                    names.append(name)
+        return names
+
+    def _closure(self, name):
+        # Ids of all members of the group, computed from the member lists
+        seen = set()
+        names = [name]
+        for name in names:
+            for principal_id in self[name].principals:
+                if principal_id in seen:
+                    continue
+                seen.add(principal_id)
+                member = self._memberGroup(principal_id)
+                if member is not None:
+                    names.append(member)
+        return seen
+
+    def _reindexMembers(self, names):
+        if self._members is None:
+            return
+        for name in names:
+            if name not in self:
+                self._members.pop(name, None)
+                continue
+            closure = self._closure(name)
+            members = self._members.get(name)
+            if members is None:
+                members = self._members[name] = BTrees.OOBTree.OOTreeSet()
+            for principal_id in [id for id in members if id not in closure]:
+                members.remove(principal_id)
+            members.update(closure)
+
+    def reindexMembers(self):
+        """(Re)build the index of the members of the groups."""
+        self._members = BTrees.OOBTree.OOBTree()
+        self._reindexMembers(list(self.keys()))
 
     def getGroupsForPrincipal(self, principalid):
         """Get groups the given principal belongs to"""
@@ -219,6 +400,87 @@ class GroupFolder(BTreeContainer):
         """Get principals which belong to the group"""
         return self[groupid].principals
 
+    def getAllMembersOfGroup(self, groupid, start=None, batch_size=None,
+                             after=None, principalsOnly=False):
+        """Get principals which belong to the group, also through other groups
+
+        The members are read from an index the folder maintains.
+        """
+        if groupid not in self:
+            raise KeyError(groupid)
+        if self._members is None:
+            ids = sorted(self._closure(groupid))
+            if after is not None:
+                ids = [id for id in ids if id > after]
+        else:
+            ids = self._members.get(groupid, ())
+            if ids and after is not None:
+                ids = ids.keys(min=after, excludemin=True)
+        if principalsOnly:
+            ids = (id for id in ids if self._memberGroup(id) is None)
+        stop = None
+        if batch_size is not None:
+            stop = (start or 0) + batch_size
+        return itertools.islice(ids, start, stop)
+
+    def _membership(self):
+        # (generation, {group id: bit number}, {principal id: bits})
+        generation = self.getGeneration()
+        membership = getattr(self, '_v_membership', None)
+        if (membership is None or membership[0] != generation
+                or len(membership[2]) >= self.membershipCacheSize):
+            numbers = {self.prefix + name: number
+                       for number, name in enumerate(self.keys())}
+            membership = self._v_membership = (generation, numbers, {})
+        return membership
+
+    def getGroupBits(self, group_ids):
+        """Return a bitset (an int) of the given groups of the folder.
+
+        Ids of groups not in the folder are ignored.  The bits are only
+        meaningful until the groups change.
+        """
+        numbers = self._membership()[1]
+        bits = 0
+        for group_id in group_ids:
+            number = numbers.get(group_id)
+            if number is not None:
+                bits |= 1 << number
+        return bits
+
+    def getMembershipBits(self, principal_id):
+        """Return a bitset of the groups the principal belongs to.
+
+        This includes the groups the principal belongs to through other
+        groups of the folder.  Compare it to `getGroupBits`.
+        """
+        generation, numbers, memberships = self._membership()
+        bits = memberships.get(principal_id)
+        if bits is None:
+            bits = 0
+            prefix = getattr(self.__parent__, 'prefix', '')
+            seen = set()
+            stack = list(self.getGroupsForPrincipal(principal_id))
+            while stack:
+                group_id = stack.pop()
+                if group_id in seen:
+                    continue
+                seen.add(group_id)
+                number = numbers.get(group_id)
+                if number is not None:
+                    bits |= 1 << number
+                stack.extend(self.getGroupsForPrincipal(prefix + group_id))
+            memberships[principal_id] = bits
+        return bits
+
+    def isMember(self, principal_id, group_id):
+        """Return whether the principal belongs to the group.
+
+        Membership through other groups of the folder counts as well.
+        """
+        return bool(self.getMembershipBits(principal_id)
+                    & self.getGroupBits((group_id, )))
+
     def search(self, query, start=None, batch_size=None):
         """ Search for groups"""
         search = query.get('search')
@@ -350,18 +612,26 @@ def setGroupsForPrincipal(event):
         return
 
     authentication = event.authentication
-
-    for name, plugin in authentication.getAuthenticatorPlugins():
-        if not IGroupFolder.providedBy(plugin):
-            continue
-        groupfolder = plugin
-        principal.groups.extend(
-            [authentication.prefix + id
-             for id in groupfolder.getGroupsForPrincipal(principal.id)
-             ])
-        id = principal.id
-        prefix = authentication.prefix + groupfolder.prefix
-        if id.startswith(prefix) and id[len(prefix):] in groupfolder:
+    getGroupFolders = getattr(authentication, 'getGroupFolders', None)
+    if getGroupFolders is not None:
+        groupfolders = getGroupFolders()
+        prefixGroupIds = authentication.prefixGroupIds
+    else:
+        groupfolders = [
+            (plugin, authentication.prefix + plugin.prefix)
+            for name, plugin in authentication.getAuthenticatorPlugins()
+            if IGroupFolder.providedBy(plugin)]
+
+        def prefixGroupIds(ids):
+            return [authentication.prefix + group_id for group_id in ids]
+
+    id = principal.id
+    for groupfolder, prefix in groupfolders:
+        groups = groupfolder.getGroupsForPrincipal(id)
+        if groups:
+            principal.groups.extend(prefixGroupIds(groups))
+        if (not IGroup.providedBy(principal) and id.startswith(prefix)
+                and id[len(prefix):] in groupfolder):
             alsoProvides(principal, IGroup)
 
 
@@ -370,8 +640,9 @@ def setMemberSubscriber(event):
     """adds `getMembers`, `setMembers` to groups made from IGroupPrincipalInfo.
     """
     info = event.info
-    if IGroupPrincipalInfo.providedBy(info):
-        principal = event.principal
+    principal = event.principal
+    if (IGroupPrincipalInfo.providedBy(info)
+            and not IMemberAwareGroup.providedBy(principal)):
         principal.getMembers = lambda: info.members
 
         def setMembers(value):
@@ -16,6 +16,7 @@
 __docformat__ = "reStructuredText"
 
 import base64
+import functools
 
 from zope.interface import Interface
 from zope.interface import implementer
@@ -37,6 +38,22 @@ class IHTTPBasicAuthRealm(Interface):
                      default='Zope')
 
 
+_ANNOTATION_KEY = __name__ + '.basic'
+
+
+@functools.lru_cache(maxsize=256)
+def _parseBasicAuth(auth):
+    # Returns (login, password), or None for malformed headers
+    credentials = auth.split()[-1]
+    try:
+        login, password = base64.b64decode(credentials.encode()).split(
+            b':', 1)
+        return login.decode('utf-8'), password.decode('utf-8')
+    except ValueError:
+        # Includes binascii.Error and UnicodeError
+        return None
+
+
 @implementer(interfaces.ICredentialsPlugin, IHTTPBasicAuthRealm)
 class HTTPBasicAuthCredentialsPlugin:
 
@@ -87,20 +104,52 @@ class HTTPBasicAuthCredentialsPlugin:
           >>> pprint(plugin.extractCredentials(request))
           {'login': 'mgr', 'password': 'mgrpw:with:colon'}
 
+        Malformed headers are ignored:
+
+          >>> for auth in ('Basic bWdy', 'Basic !!!!', 'Basic /w==', 'Basic '):
+          ...     request = BrowserRequest('/',
+          ...         environ={'HTTP_AUTHORIZATION': auth})
+          ...     print(plugin.extractCredentials(request))
+          None
+          None
+          None
+          None
+
+        Parsing results, including the rejection of malformed headers, are
+        remembered on the request and, for the most recently used header
+        values, in the process:
+
+          >>> _parseBasicAuth.cache_clear()
+          >>> request = BrowserRequest('/',
+          ...     environ={'HTTP_AUTHORIZATION': 'Basic bWdyOm1ncnB3'})
+          >>> plugin.extractCredentials(request) == (
+          ...     plugin.extractCredentials(request))
+          True
+          >>> _parseBasicAuth.cache_info().misses
+          1
+          >>> request = BrowserRequest('/',
+          ...     environ={'HTTP_AUTHORIZATION': 'Basic bWdyOm1ncnB3'})
+          >>> pprint(plugin.extractCredentials(request))
+          {'login': 'mgr', 'password': 'mgrpw'}
+          >>> _parseBasicAuth.cache_info().hits
+          1
+
         """  # noqa: E501 line too long
         if not IHTTPRequest.providedBy(request):
             return None
 
-        if request._auth:
-            if request._auth.lower().startswith('basic '):
-                credentials = request._auth.split()[-1]
-                if isinstance(credentials, str):
-                    # No encoding needed, should be base64 string anyways.
-                    credentials = credentials.encode()
-                login, password = base64.b64decode(credentials).split(b':', 1)
-                return {'login': login.decode('utf-8'),
-                        'password': password.decode('utf-8')}
-        return None
+        auth = request._auth
+        if not auth or not auth.lower().startswith('basic '):
+            return None
+        cached = request.annotations.get(_ANNOTATION_KEY)
+        if cached is not None and cached[0] == auth:
+            parsed = cached[1]
+        else:
+            parsed = _parseBasicAuth(auth)
+            request.annotations[_ANNOTATION_KEY] = (auth, parsed)
+        if parsed is None:
+            return None
+        return {'login': parsed[0], 'password': parsed[1]}
 
     def challenge(self, request):
         """Issues an HTTP basic auth challenge for credentials.
@@ -151,3 +200,76 @@ class HTTPBasicAuthCredentialsPlugin:
 
         """
         return False
+
+
+@implementer(interfaces.ICredentialsPlugin, IHTTPBasicAuthRealm)
+class HTTPBearerCredentialsPlugin:
+    """Extracts API keys sent as bearer tokens or in an API key header.
+
+    The credentials are a dictionary with the key as `token`:
+
+      >>> plugin = HTTPBearerCredentialsPlugin()
+      >>> from zope.publisher.browser import TestRequest
+      >>> plugin.extractCredentials(TestRequest(
+      ...     environ={'HTTP_AUTHORIZATION': 'Bearer 1234.abcd'}))
+      {'token': '1234.abcd'}
+      >>> plugin.extractCredentials(TestRequest(
+      ...     environ={'HTTP_X_API_KEY': '1234.abcd'}))
+      {'token': '1234.abcd'}
+
+    Other authorization schemes and HTTP requests without a key are
+    ignored, as are requests of other protocols:
+
+      >>> print(plugin.extractCredentials(TestRequest(
+      ...     environ={'HTTP_AUTHORIZATION': 'Basic bWdyOm1ncnB3'})))
+      None
+      >>> print(plugin.extractCredentials(TestRequest()))
+      None
+      >>> from zope.publisher.base import TestRequest as BaseRequest
+      >>> print(plugin.extractCredentials(BaseRequest('/')))
+      None
+
+    The plugin challenges like the basic auth plugin, with the bearer
+    scheme:
+
+      >>> request = TestRequest()
+      >>> plugin.challenge(request)
+      True
+      >>> request.response.getStatus()
+      401
+      >>> request.response.getHeader('WWW-Authenticate', literal=True)
+      'Bearer realm="Zope"'
+      >>> plugin.challenge(BaseRequest('/'))
+      False
+      >>> plugin.logout(request)
+      False
+
+    """
+
+    realm = 'Zope'
+
+    headerName = 'X-API-Key'
+
+    def extractCredentials(self, request):
+        if not IHTTPRequest.providedBy(request):
+            return None
+        if request._auth:
+            scheme, sep, token = request._auth.partition(' ')
+            if scheme.lower() == 'bearer' and token.strip():
+                return {'token': token.strip()}
+        token = request.getHeader(self.headerName)
+        if token:
+            return {'token': token}
+        return None
+
+    def challenge(self, request):
+        if not IHTTPRequest.providedBy(request):
+            return False
+        request.response.setHeader("WWW-Authenticate",
+                                   'Bearer realm="%s"' % self.realm,
+                                   literal=True)
+        request.response.setStatus(401)
+        return True
+
+    def logout(self, request):
+        return False
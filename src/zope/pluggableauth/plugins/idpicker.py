@@ -18,6 +18,7 @@ __docformat__ = 'restructuredtext'
 
 import re
 
+from BTrees.OOBTree import OOBTree
 from zope.container.contained import NameChooser
 from zope.exceptions.interfaces import UserError
 from zope.i18nmessageid import MessageFactory
@@ -57,19 +58,109 @@ class IdPicker(NameChooser):
       >>> IdPicker({'bob': 1}).chooseName('bob', None)
       'bob1'
 
+    Persistent containers, like principal and group folders, remember the
+    highest number picked for every name, so that picking a numeric id does
+    not need to try all the numbers in use:
+
+      >>> from zope.pluggableauth.plugins.groupfolder import (
+      ...     GroupFolder, GroupInformation)
+      >>> folder = GroupFolder()
+      >>> for i in range(3):
+      ...     name = IdPicker(folder).chooseName('', None)
+      ...     folder[name] = GroupInformation()
+      >>> list(folder)
+      ['1', '2', '3']
+      >>> dict(folder._idCounters)
+      {'': 3}
+
+    Names added otherwise are still skipped:
+
+      >>> folder['4'] = GroupInformation()
+      >>> IdPicker(folder).chooseName('', None)
+      '5'
+
     """
 
+    def _counters(self):
+        counters = getattr(self.context, '_idCounters', None)
+        if counters is None:
+            try:
+                counters = self.context._idCounters = OOBTree()
+            except AttributeError:
+                # Not a container we can remember counters on
+                return {}
+        return counters
+
+    def _number(self, orig, i, reserved=()):
+        # Return the first free name orig + str(n) with n > i, and n
+        while True:
+            i += 1
+            name = orig + str(i)
+            if name not in reserved and name not in self.context:
+                return name, i
+
     def chooseName(self, name, object):
-        i = 0
         name = text_type(name)
         orig = name
-        while (not name) or (name in self.context):
-            i += 1
-            name = orig + str(i)
+        if (not name) or (name in self.context):
+            counters = self._counters()
+            name, counters[orig] = self._number(orig, counters.get(orig, 0))
 
         self.checkName(name, object)
         return name
 
+    def reserveNames(self, names, object=None):
+        """Choose unique ids for a batch of objects to be added.
+
+        This works like calling `chooseName` for every name, except that the
+        chosen ids are also unique within the batch:
+
+          >>> from zope.pluggableauth.plugins.groupfolder import (
+          ...     GroupFolder, GroupInformation)
+          >>> folder = GroupFolder()
+          >>> folder['bob'] = GroupInformation()
+          >>> IdPicker(folder).reserveNames(['bob', 'sue', 'sue', '', ''])
+          ['bob1', 'sue', 'sue1', '1', '2']
+
+        The container is asked about every distinct name once, and the
+        names are checked once per distinct name given:
+
+          >>> IdPicker(folder).reserveNames(['bob', 'big bob'])
+          Traceback (most recent call last):
+          ...
+          zope.exceptions.interfaces.UserError: Ids must contain only printable 7-bit non-space ASCII characters
+
+        Nothing is reserved in the container; the ids are meant to be used
+        right away.  The counters of numbered ids are only updated if all
+        names are valid:
+
+          >>> IdPicker(folder).reserveNames(['bob', ''])
+          ['bob2', '3']
+
+        """  # noqa: E501 line too long
+        names = [text_type(name) for name in names]
+        taken = {name for name in set(names) if name and name in self.context}
+        counters = self._counters()
+        numbers = {}
+        reserved = set()
+        checked = set()
+        result = []
+        for name in names:
+            orig = name
+            if (not name) or (name in taken) or (name in reserved):
+                i = numbers.get(orig, counters.get(orig, 0))
+                name, numbers[orig] = self._number(orig, i, reserved)
+            if orig in checked:
+                # Only the appended number differs from an id checked before
+                self._checkLength(name)
+            else:
+                self.checkName(name, object)
+                checked.add(orig)
+            reserved.add(name)
+            result.append(name)
+        counters.update(numbers)
+        return result
+
     def checkName(self, name, object):
         """Limit ids
 
@@ -113,8 +204,11 @@ class IdPicker(NameChooser):
                 _("Ids must contain only printable 7-bit non-space"
                   " ASCII characters")
             )
+        self._checkLength(name)
+        return True
+
+    def _checkLength(self, name):
         if len(name) > 100:
             raise UserError(
                 _("Ids can't be more than 100 characters long.")
             )
-        return True
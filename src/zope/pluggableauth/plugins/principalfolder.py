@@ -17,7 +17,18 @@ $Id$
 """
 __docformat__ = "reStructuredText"
 
+import itertools
+import re
+import threading
+
+from BTrees.Interfaces import BTreesConflictError
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOBucket
+from BTrees.OOBTree import OOTreeSet
+from BTrees.OOBTree import intersection
 from persistent import Persistent
+from zope.component import adapter
 from zope.component import getUtility
 from zope.container.btree import BTreeContainer
 from zope.container.constraints import containers
@@ -27,6 +38,7 @@ from zope.container.interfaces import DuplicateIDError
 from zope.i18nmessageid import MessageFactory
 from zope.interface import Interface
 from zope.interface import implementer
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
 from zope.password.interfaces import IPasswordManager
 from zope.schema import Choice
 from zope.schema import Password
@@ -121,6 +133,134 @@ class ISearchSchema(Interface):
         missing_value='')
 
 
+class IPrincipalSearchSchema(ISearchSchema):
+    """Indexed search interface for principal folders
+
+    All given criteria must match.
+    """
+
+    login = TextLine(
+        title=_("Login"),
+        description=_("The exact login of the principal"),
+        required=False,
+        default='',
+        missing_value='')
+
+    title = TextLine(
+        title=_("Title starts with"),
+        description=_("The beginning of the title of the principal"),
+        required=False,
+        default='',
+        missing_value='')
+
+    description = TextLine(
+        title=_("Description contains"),
+        description=_("Words contained in the description of the principal"),
+        required=False,
+        default='',
+        missing_value='')
+
+
+_words = re.compile(r'\w+').findall
+
+
+def _terms(text):
+    return sorted(set(_words(text.lower())))
+
+
+_conflicts = {}
+_conflicts_lock = threading.Lock()
+
+
+def _countConflict(index, outcome):
+    with _conflicts_lock:
+        key = (index, outcome)
+        _conflicts[key] = _conflicts.get(key, 0) + 1
+
+
+def getConflictCounts():
+    """Return a mapping of ``(index, outcome)`` to conflict counts.
+
+    ``outcome`` is either ``'resolved'`` or ``'failed'``.  Conflict
+    resolution runs wherever the storage resolves conflicts, so with ZEO
+    these counters are only meaningful in the storage server process.
+    """
+    with _conflicts_lock:
+        return dict(_conflicts)
+
+
+def resetConflictCounts():
+    with _conflicts_lock:
+        _conflicts.clear()
+
+
+class _CountingResolution:
+    """Mixin counting resolved and failed write conflicts.
+
+    Concrete classes set `index` to the name the conflicts are counted under.
+    """
+
+    index = None
+
+    def _p_resolveConflict(self, *states):
+        try:
+            state = super()._p_resolveConflict(*states)
+        except BTreesConflictError:
+            _countConflict(self.index, 'failed')
+            raise
+        _countConflict(self.index, 'resolved')
+        return state
+
+
+class PrincipalBucket(_CountingResolution, OOBucket):
+    index = 'principals'
+
+
+class PrincipalTree(_CountingResolution, OOBTree):
+    """Principal storage of a `PrincipalFolder` created with
+    ``conflictCounting=True``.
+
+    Conflicts are resolved by the storage, so with ZEO the storage server
+    must be able to import zope.pluggableauth to resolve conflicts in these
+    trees.  Without it, every concurrent insert into the same bucket fails
+    with a ``ConflictError``.
+
+    Concurrent inserts of different keys into the same bucket are merged
+    by the bucket's conflict resolution; only bucket splits still conflict.
+    Principal ids are often sequential, so every insert lands in the last
+    bucket.  Larger buckets make those splits, and hence the conflicts
+    that cannot be resolved, correspondingly rarer.
+    """
+
+    index = 'principals'
+    _bucket_type = PrincipalBucket
+    max_leaf_size = 120
+
+
+class LoginBucket(_CountingResolution, OOBucket):
+    index = 'logins'
+
+
+class LoginTree(_CountingResolution, OOBTree):
+    """Login to principal id index of a `PrincipalFolder` created with
+    ``conflictCounting=True``.
+
+    See `PrincipalTree` for the deployment requirement.
+    """
+
+    index = 'logins'
+    _bucket_type = LoginBucket
+    max_leaf_size = 120
+
+
+def _notifyPrincipalChanged(principal):
+    # Other IInternalPrincipalContainer implementations need not keep
+    # indexes or a generation.
+    notify = getattr(principal.__parent__, 'notifyPrincipalChanged', None)
+    if notify is not None:
+        notify(principal)
+
+
 @implementer(IInternalPrincipal, IInternalPrincipalContained)
 class InternalPrincipal(Persistent, Contained):
     """An internal principal for Persistent Principal Folder."""
@@ -156,6 +296,7 @@ class InternalPrincipal(Persistent, Contained):
             self._passwordManagerName = passwordManagerName
         passwordManager = self._getPasswordManager()
         self._password = passwordManager.encodePassword(password)
+        _notifyPrincipalChanged(self)
 
     password = property(getPassword, setPassword)
 
@@ -163,6 +304,33 @@ class InternalPrincipal(Persistent, Contained):
         passwordManager = self._getPasswordManager()
         return passwordManager.checkPassword(self.password, password)
 
+    def getTitle(self):
+        return self._title
+
+    def setTitle(self, title):
+        self._title = title
+        _notifyPrincipalChanged(self)
+
+    title = property(getTitle, setTitle)
+
+    def getDescription(self):
+        return self._description
+
+    def setDescription(self, description):
+        self._description = description
+        _notifyPrincipalChanged(self)
+
+    description = property(getDescription, setDescription)
+
+    def __setstate__(self, state):
+        # Principals stored by earlier versions keep their title and
+        # description in plain attributes.
+        if isinstance(state, dict) and 'title' in state:
+            state = dict(state)
+            state['_title'] = state.pop('title')
+            state['_description'] = state.pop('description', '')
+        super().__setstate__(state)
+
     def getLogin(self):
         return self._login
 
@@ -179,6 +347,12 @@ class InternalPrincipal(Persistent, Contained):
     login = property(getLogin, setLogin)
 
 
+@adapter(IInternalPrincipal, IObjectModifiedEvent)
+def principalModified(principal, event):
+    """Count edits of contained principals as principal changes."""
+    _notifyPrincipalChanged(principal)
+
+
 @implementer(IAuthenticatorPlugin,
              IQuerySchemaSearch,
              IInternalPrincipalContainer)
@@ -188,12 +362,38 @@ class PrincipalFolder(BTreeContainer):
     See principalfolder.txt for details.
     """
 
-    schema = ISearchSchema
+    schema = IPrincipalSearchSchema
+
+    _generation = None
+
+    # Folders created before the title and description indexes existed
+    # search without them until `reindexPrincipals` is called.
+    _indexed = None
 
-    def __init__(self, prefix=''):
+    # Whether the principals and the login index are stored in
+    # `PrincipalTree` and `LoginTree` instead of plain BTrees.
+    conflictCounting = False
+
+    def __init__(self, prefix='', conflictCounting=False):
         self.prefix = prefix
+        if conflictCounting:
+            self.conflictCounting = True
         super().__init__()
-        self.__id_by_login = self._newContainerData()
+        self.__id_by_login = self._newLoginIndex()
+        self._generation = Length()
+        self._title_index = OOBTree()
+        self._term_index = OOBTree()
+        self._indexed = OOBTree()
+
+    def _newContainerData(self):
+        if self.conflictCounting:
+            return PrincipalTree()
+        return OOBTree()
+
+    def _newLoginIndex(self):
+        if self.conflictCounting:
+            return LoginTree()
+        return OOBTree()
 
     def notifyLoginChanged(self, oldLogin, principal):
         """Notify the Container about changed login of a principal.
@@ -206,6 +406,30 @@ class PrincipalFolder(BTreeContainer):
 
         del self.__id_by_login[oldLogin]
         self.__id_by_login[principal.login] = principal.__name__
+        self.notifyPrincipalChanged(principal)
+
+    def notifyPrincipalChanged(self, principal):
+        """Notify the Container about a changed principal.
+
+        This updates the title and description indexes and increases the
+        generation, see `getGeneration`.
+        """
+        if principal.__name__ in self:
+            self._index(principal.__name__, principal)
+        self._changed()
+
+    def _changed(self):
+        if self._generation is None:
+            self._generation = Length()
+        # The counter only ever grows so that equal generations always
+        # mean unchanged principals.  Length resolves concurrent changes.
+        self._generation.change(1)
+
+    def getGeneration(self):
+        """Return a number that increases whenever a principal changes."""
+        if self._generation is None:
+            return 0
+        return self._generation()
 
     def __setitem__(self, id, principal):
         """Add principal information.
@@ -240,12 +464,57 @@ class PrincipalFolder(BTreeContainer):
 
         super().__setitem__(id, principal)
         self.__id_by_login[principal.login] = id
+        self._index(id, principal)
+        self._changed()
 
     def __delitem__(self, id):
         """Remove principal information."""
         principal = self[id]
         super().__delitem__(id)
         del self.__id_by_login[principal.login]
+        self._unindex(id)
+        self._changed()
+
+    def _index(self, id, principal):
+        if self._indexed is None:
+            return
+        entry = (principal.title.lower(), tuple(_terms(principal.description)))
+        old = self._indexed.get(id)
+        if old == entry:
+            return
+        if old is not None:
+            self._unindex(id)
+        title, terms = entry
+        for index, key in [(self._title_index, title)] + [
+                (self._term_index, term) for term in terms]:
+            ids = index.get(key)
+            if ids is None:
+                ids = index[key] = OOTreeSet()
+            ids.insert(id)
+        self._indexed[id] = entry
+
+    def _unindex(self, id):
+        if self._indexed is None:
+            return
+        entry = self._indexed.get(id)
+        if entry is None:
+            return
+        title, terms = entry
+        for index, key in [(self._title_index, title)] + [
+                (self._term_index, term) for term in terms]:
+            ids = index[key]
+            ids.remove(id)
+            if not ids:
+                del index[key]
+        del self._indexed[id]
+
+    def reindexPrincipals(self):
+        """(Re)build the title and description indexes."""
+        self._title_index = OOBTree()
+        self._term_index = OOBTree()
+        self._indexed = OOBTree()
+        for id, principal in self.items():
+            self._index(id, principal)
 
     def authenticateCredentials(self, credentials):
         """Return principal info if credentials can be authenticated
@@ -273,9 +542,63 @@ class PrincipalFolder(BTreeContainer):
     def getIdByLogin(self, login):
         return self.prefix + self.__id_by_login[login]
 
+    def getCredentialsStamp(self, id):
+        """Return a value that changes with the login information of the
+        principal, or None if there is no such principal.
+        """
+        if id.startswith(self.prefix):
+            internal = self.get(id[len(self.prefix):])
+            if internal is not None:
+                return (internal.login, internal.password, internal.title,
+                        internal.description)
+
+    def _searchIndexes(self, login, title, terms):
+        """Return the sorted ids matching all criteria using the indexes."""
+        result = None
+        if login:
+            id = self.__id_by_login.get(login)
+            result = OOTreeSet(() if id is None else (id,))
+        if title:
+            ids = OOTreeSet()
+            for key, matches in self._title_index.items(title):
+                if not key.startswith(title):
+                    break
+                ids.update(matches)
+            result = intersection(result, ids)
+        for term in terms:
+            result = intersection(
+                result, self._term_index.get(term, OOTreeSet()))
+        return result
+
     def search(self, query, start=None, batch_size=None):
         """Search through this principal provider."""
         search = query.get('search')
+        login = query.get('login')
+        title = (query.get('title') or '').lower()
+        terms = _terms(query.get('description') or '')
+        if login or title or terms:
+            if self._indexed is not None:
+                ids = self._searchIndexes(login, title, terms)
+                values = (self[id] for id in ids)
+            else:
+                values = (
+                    value for value in self.values()
+                    if (not login or value.login == login) and
+                    value.title.lower().startswith(title) and
+                    set(terms).issubset(_words(value.description.lower())))
+            if search:
+                search = search.lower()
+                values = (
+                    value for value in values
+                    if (search in value.title.lower() or
+                        search in value.description.lower() or
+                        search in value.login.lower()))
+            stop = None
+            if batch_size is not None:
+                stop = (start or 0) + batch_size
+            for value in itertools.islice(values, start, stop):
+                yield self.prefix + value.__name__
+            return
         if search is None:
             return
         search = search.lower()
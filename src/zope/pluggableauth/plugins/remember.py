@@ -0,0 +1,424 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Persistent "remember me" login tokens.
+"""
+__docformat__ = 'restructuredtext'
+
+import hashlib
+import itertools
+import random
+import secrets
+import time
+
+import persistent
+import zope.container.contained
+from BTrees.IOBTree import IOBTree
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+from zope.component import adapter
+from zope.interface import Interface
+from zope.interface import implementer
+from zope.publisher.interfaces.http import IHTTPRequest
+from zope.schema import Int
+from zope.schema import TextLine
+
+from zope.pluggableauth.interfaces import IAuthenticatedPrincipalCreated
+from zope.pluggableauth.interfaces import ICredentialsPlugin
+from zope.pluggableauth.interfaces import ISweepablePlugin
+from zope.pluggableauth.plugins.apikey import APIKeyAuthenticatorPlugin
+from zope.pluggableauth.plugins.session import IBrowserFormChallenger
+from zope.pluggableauth.plugins.ticket import Ticket
+from zope.pluggableauth.plugins.ticket import TicketAuthenticatorPlugin
+
+
+class IRememberMeCredentials(Interface):
+    """Credentials plugin keeping long-lived login tokens."""
+
+    cookieName = TextLine(
+        title='Cookie name',
+        description="Name of the cookie holding the token.",
+        default='zope.pluggableauth.remember')
+
+    rememberfield = TextLine(
+        title='Rememberfield',
+        description="Field of the login page which asks for a token to"
+        " be issued.",
+        default='remember')
+
+    lifetime = Int(
+        title='Lifetime',
+        description="Number of seconds a token is valid.",
+        default=30 * 24 * 3600)
+
+    bucketSize = Int(
+        title='Expiry bucket size',
+        description="Tokens expiring within the same number of seconds are"
+        " purged together.",
+        default=24 * 3600,
+        readonly=True)
+
+
+def _digest(token):
+    # Tokens are random, so a fast hash protects them as well as a slow one
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+@implementer(ICredentialsPlugin, ISweepablePlugin, IRememberMeCredentials)
+class RememberMeCredentialsPlugin(persistent.Persistent,
+                                  zope.container.contained.Contained):
+    """A credentials plugin for long-lived "remember me" tokens.
+
+    The tokens are random strings kept in a cookie.  The plugin only stores
+    their SHA-256 digests, mapped to the principal id and the expiry time.
+    Valid tokens are turned into tickets for the
+    `zope.pluggableauth.plugins.ticket.TicketAuthenticatorPlugin`.
+
+      >>> plugin = RememberMeCredentialsPlugin()
+
+    A token is issued after a successful login through a form with the
+    `rememberfield` checked (the `issueTokenSubscriber` calls `issueTicket`,
+    whichever credentials plugin handled the login):
+
+      >>> from zope.publisher.browser import TestRequest
+      >>> request = TestRequest(login='bob', password='secret', remember='on')
+      >>> plugin.issueTicket(request, 'users.bob', now=1000)
+      >>> cookie = request.response.getCookie('zope.pluggableauth.remember')
+      >>> cookie['max_age']
+      2592000
+      >>> len(plugin)
+      1
+
+    The login form itself is left to other credentials plugins:
+
+      >>> print(plugin.extractCredentials(request))
+      None
+
+    Without the field, no token is issued:
+
+      >>> request = TestRequest(login='bob', password='secret')
+      >>> plugin.issueTicket(request, 'users.bob', now=1000)
+      >>> print(request.response.getCookie('zope.pluggableauth.remember'))
+      None
+
+    Validating a token is a single BTree lookup:
+
+      >>> def tokenRequest(token):
+      ...     return TestRequest(
+      ...         HTTP_COOKIE='zope.pluggableauth.remember=' + token)
+      >>> ticket = plugin.extractCredentials(
+      ...     tokenRequest(cookie['value']), now=2000)
+      >>> ticket
+      Ticket('users.bob')
+      >>> ticket.expires
+      2593000
+      >>> print(plugin.extractCredentials(tokenRequest('guessed'), now=2000))
+      None
+      >>> print(plugin.extractCredentials(
+      ...     tokenRequest(cookie['value']), now=2593000))
+      None
+
+    Logout revokes the token and expires the cookie.  It returns False, so
+    that the pluggable authentication utility also asks the next plugins,
+    like the session plugin that performed the login, to log out.  The
+    plugin should therefore come first in the credentials plugins:
+
+      >>> request = tokenRequest(cookie['value'])
+      >>> plugin.logout(request)
+      False
+      >>> request.response.getCookie('zope.pluggableauth.remember')['value']
+      'deleted'
+      >>> print(plugin.extractCredentials(
+      ...     tokenRequest(cookie['value']), now=2000))
+      None
+      >>> len(plugin)
+      0
+
+    Tokens are also indexed by expiry bucket (a day by default), so expired
+    tokens can be purged without looking at the others:
+
+      >>> for now in (0, 3600, 86400, 5 * 86400):
+      ...     plugin.issueTicket(
+      ...         TestRequest(remember='on'), 'users.bob', now=now)
+      >>> len(plugin)
+      4
+      >>> plugin.purgeExpired(now=plugin.lifetime + 2 * 86400)
+      3
+      >>> len(plugin)
+      1
+
+    The same can be done in small steps, so that no single call takes long:
+
+      >>> for now in (0, 3600, 86400):
+      ...     plugin.issueTicket(
+      ...         TestRequest(remember='on'), 'users.bob', now=now)
+      >>> plugin.sweep(2, now=plugin.lifetime + 2 * 86400)
+      2
+      >>> plugin.sweep(2, now=plugin.lifetime + 2 * 86400)
+      1
+      >>> plugin.sweep(2, now=plugin.lifetime + 2 * 86400)
+      0
+      >>> len(plugin)
+      1
+
+    Only buckets that expired entirely are purged; the remaining expired
+    tokens are rejected on validation until their bucket is purged.
+
+    The plugin doesn't challenge, and works with HTTP requests only:
+
+      >>> plugin.challenge(TestRequest())
+      False
+      >>> from zope.publisher.base import TestRequest
+      >>> print(plugin.extractCredentials(TestRequest('/')))
+      None
+      >>> plugin.logout(TestRequest('/'))
+      False
+
+    """
+
+    cookieName = 'zope.pluggableauth.remember'
+    rememberfield = 'remember'
+    lifetime = 30 * 24 * 3600
+    bucketSize = 24 * 3600
+
+    def __init__(self):
+        # token digest -> (principal id, expiry)
+        self._tokens = OOBTree()
+        # expiry bucket -> token digests
+        self._expiry = IOBTree()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _bucket(self, expires):
+        return int(expires) // self.bucketSize
+
+    def issueTicket(self, request, principalId, now=None):
+        """Store a new token for `principalId` if one was asked for."""
+        if not request.get(self.rememberfield):
+            return
+        if now is None:
+            now = time.time()
+        token = secrets.token_urlsafe(32)
+        digest = _digest(token)
+        expires = int(now) + self.lifetime
+        self._tokens[digest] = (principalId, expires)
+        bucket = self._expiry.get(self._bucket(expires))
+        if bucket is None:
+            bucket = self._expiry[self._bucket(expires)] = OOTreeSet()
+        bucket.insert(digest)
+        request.response.setCookie(
+            self.cookieName, token, path='/', max_age=self.lifetime,
+            httponly=True, secure=request.getURL().startswith('https:'))
+
+    def extractCredentials(self, request, now=None):
+        """Return a ticket for a valid token."""
+        if not IHTTPRequest.providedBy(request):
+            return None
+        token = request.getCookies().get(self.cookieName)
+        if not token:
+            return None
+        entry = self._tokens.get(_digest(token))
+        if entry is None:
+            return None
+        principalId, expires = entry
+        if now is None:
+            now = time.time()
+        if expires <= now:
+            return None
+        return Ticket(principalId, expires)
+
+    def _revoke(self, digest):
+        entry = self._tokens.pop(digest, None)
+        if entry is None:
+            return
+        key = self._bucket(entry[1])
+        bucket = self._expiry[key]
+        bucket.remove(digest)
+        if not bucket:
+            del self._expiry[key]
+
+    def sweep(self, limit=None, now=None):
+        """Remove up to `limit` tokens of expired buckets, return how many.
+
+        The sweep starts at a random expired token, so that concurrent
+        sweeps rarely remove the same tokens.
+        """
+        if now is None:
+            now = time.time()
+        keys = list(self._expiry.keys(max=self._bucket(now) - 1))
+        if not keys:
+            return 0
+        start = random.randrange(len(keys))
+        count = 0
+        for key in keys[start:] + keys[:start]:
+            if limit is not None and count >= limit:
+                break
+            bucket = self._expiry[key]
+            digest = '%064x' % random.getrandbits(256)
+            digests = itertools.chain(
+                bucket.keys(min=digest),
+                bucket.keys(max=digest, excludemax=True))
+            if limit is not None:
+                digests = itertools.islice(digests, limit - count)
+            for digest in list(digests):
+                bucket.remove(digest)
+                del self._tokens[digest]
+                count += 1
+            if not bucket:
+                del self._expiry[key]
+        return count
+
+    def purgeExpired(self, now=None):
+        """Remove the tokens of all expired buckets, return how many."""
+        return self.sweep(None, now)
+
+    def challenge(self, request):
+        return False
+
+    def logout(self, request):
+        """Revokes the token of the request and expires its cookie."""
+        if not IHTTPRequest.providedBy(request):
+            return False
+        token = request.getCookies().get(self.cookieName)
+        if token:
+            self._revoke(_digest(token))
+            request.response.expireCookie(self.cookieName, path='/')
+        return False
+
+
+@adapter(IAuthenticatedPrincipalCreated)
+def issueTokenSubscriber(event):
+    """Issue remember-me tokens after a form login asking for one.
+
+    The login may be handled by any credentials plugin collecting the login
+    and password with a form (`IBrowserFormChallenger`), before or after the
+    remember-me plugin:
+
+      >>> from zope.component import provideAdapter, provideHandler
+      >>> from zope.interface import implementer
+      >>> from zope.pluggableauth.authentication import (
+      ...     PluggableAuthentication)
+      >>> from zope.pluggableauth.factories import (
+      ...     AuthenticatedPrincipalFactory, PrincipalInfo)
+      >>> from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+      >>> from zope.pluggableauth.plugins.signedcookie import (
+      ...     SignedCookieCredentialsPlugin)
+      >>> from zope.pluggableauth.plugins.ticket import issueTicketSubscriber
+      >>> provideAdapter(AuthenticatedPrincipalFactory)
+      >>> provideHandler(issueTicketSubscriber)
+      >>> provideHandler(issueTokenSubscriber)
+
+      >>> @implementer(IAuthenticatorPlugin)
+      ... class Users:
+      ...     def authenticateCredentials(self, credentials):
+      ...         if credentials == {'login': 'bob', 'password': 'secret'}:
+      ...             return PrincipalInfo('users.bob', 'bob', 'Bob', '')
+      ...     def principalInfo(self, id):
+      ...         if id == 'users.bob':
+      ...             return PrincipalInfo(id, 'bob', 'Bob', '')
+
+      >>> pau = PluggableAuthentication()
+      >>> pau['remember'] = remember = RememberMeCredentialsPlugin()
+      >>> pau['cookie'] = SignedCookieCredentialsPlugin()
+      >>> pau['tickets'] = TicketAuthenticatorPlugin()
+      >>> pau['users'] = Users()
+      >>> pau.credentialsPlugins = ('remember', 'cookie')
+      >>> pau.authenticatorPlugins = ('tickets', 'users')
+
+    A login without the `rememberfield` is left to the other plugins, which
+    keep the principal logged in:
+
+      >>> from zope.publisher.browser import TestRequest
+      >>> request = TestRequest(login='bob', password='secret')
+      >>> pau.authenticate(request)
+      Principal('users.bob')
+      >>> len(remember)
+      0
+      >>> ticket = request.response.getCookie('zope.pluggableauth.ticket')
+      >>> pau.authenticate(TestRequest(
+      ...     HTTP_COOKIE='zope.pluggableauth.ticket=' + ticket['value']))
+      Principal('users.bob')
+
+    With the field checked, a token is issued as well, which authenticates
+    later requests without issuing another one:
+
+      >>> request = TestRequest(login='bob', password='secret', remember='on')
+      >>> pau.authenticate(request)
+      Principal('users.bob')
+      >>> len(remember)
+      1
+      >>> token = request.response.getCookie('zope.pluggableauth.remember')
+      >>> pau.authenticate(TestRequest(
+      ...     HTTP_COOKIE='zope.pluggableauth.remember=' + token['value']))
+      Principal('users.bob')
+      >>> len(remember)
+      1
+
+    The same holds when the login plugin comes first:
+
+      >>> pau.credentialsPlugins = ('cookie', 'remember')
+      >>> pau.authenticate(TestRequest(
+      ...     login='bob', password='secret', remember='on'))
+      Principal('users.bob')
+      >>> len(remember)
+      2
+
+    Other ways of authenticating don't get a token, even if the request
+    asks for one.  Otherwise, for example, an API key restricted to some
+    scopes would be turned into a token without them, which stays valid
+    after the key is revoked:
+
+      >>> from zope.pluggableauth.plugins.apikey import (
+      ...     APIKeyAuthenticatorPlugin)
+      >>> from zope.pluggableauth.plugins.httpplugins import (
+      ...     HTTPBearerCredentialsPlugin)
+      >>> pau['bearer'] = HTTPBearerCredentialsPlugin()
+      >>> pau['keys'] = keys = APIKeyAuthenticatorPlugin()
+      >>> pau.credentialsPlugins = ('remember', 'bearer', 'cookie')
+      >>> pau.authenticatorPlugins = ('tickets', 'keys', 'users')
+      >>> key = keys.addKey('users.bob', scopes=('read', ))
+      >>> request = TestRequest(
+      ...     environ={'HTTP_AUTHORIZATION': 'Bearer ' + key},
+      ...     remember='on')
+      >>> pau.authenticate(request)
+      Principal('users.bob')
+      >>> print(request.response.getCookie('zope.pluggableauth.remember'))
+      None
+      >>> len(remember)
+      2
+
+    """
+    request = event.request
+    if not IHTTPRequest.providedBy(request):
+        return
+    # Only interactive logins through a login form get a token; tickets,
+    # API keys or Basic auth would otherwise be turned into long-lived,
+    # unrestricted access.
+    info = event.info
+    if isinstance(getattr(info, 'authenticatorPlugin', None),
+                  (TicketAuthenticatorPlugin, APIKeyAuthenticatorPlugin)):
+        return
+    plugin = getattr(info, 'credentialsPlugin', None)
+    if not IBrowserFormChallenger.providedBy(plugin):
+        return
+    if not (request.get(plugin.loginfield)
+            and request.get(plugin.passwordfield)):
+        return
+    getCredentialsPlugins = getattr(
+        event.authentication, 'getCredentialsPlugins', None)
+    if getCredentialsPlugins is None:
+        return
+    for name, plugin in getCredentialsPlugins():
+        if isinstance(plugin, RememberMeCredentialsPlugin):
+            plugin.issueTicket(request, info.id)
@@ -15,20 +15,26 @@
 """
 __docformat__ = 'restructuredtext'
 
+import time
 from urllib.parse import urlencode
 
 import persistent
-import transaction
 import zope.container.contained
 from zope.component import hooks
+from zope.component import queryUtility
 from zope.interface import Interface
 from zope.interface import implementer
 from zope.publisher.interfaces.http import IHTTPRequest
+from zope.schema import Int
 from zope.schema import TextLine
+from zope.session.interfaces import IClientIdManager
 from zope.session.interfaces import ISession
 from zope.traversing.browser.absoluteurl import absoluteURL
 
 from zope.pluggableauth.interfaces import ICredentialsPlugin
+from zope.pluggableauth.plugins.ticket import ITicket
+from zope.pluggableauth.plugins.ticket import ITicketIssuer
+from zope.pluggableauth.plugins.ticket import Ticket
 
 
 class ISessionCredentials(Interface):
@@ -119,6 +125,11 @@ class SessionCredentialsPlugin(persistent.Persistent,
 
     This lets us retrieve the same session info from any test request, which
     simulates what happens when a user submits a session ID as a cookie.
+    The plugin only consults the session if the request has the client id
+    cookie, so our test requests send it along:
+
+      >>> from zope.pluggableauth.tests import SessionTestRequest
+      >>> TestRequest = SessionTestRequest
 
     We also need a session plugin:
 
@@ -130,8 +141,6 @@ class SessionCredentialsPlugin(persistent.Persistent,
 
     Our test environment is initially configured without credentials:
 
-      >>> from zope.pluggableauth.tests import sessionSetUp
-      >>> from zope.publisher.browser import TestRequest
       >>> request = TestRequest()
       >>> print(plugin.extractCredentials(request))
       None
@@ -183,6 +192,21 @@ class SessionCredentialsPlugin(persistent.Persistent,
       >>> print(plugin.extractCredentials(TestRequest()))
       None
 
+    Requests without the client id cookie, like those of most anonymous
+    visitors, can't have session data.  For them the plugin returns None
+    without involving the session machinery, which would also create a new
+    client id:
+
+      >>> plugin.extractCredentials(TestRequest(
+      ...     my_new_login_field='luke', my_new_password_field='the_force'))
+      {'login': 'luke', 'password': 'the_force'}
+      >>> from zope.publisher import browser
+      >>> request = browser.TestRequest()
+      >>> print(plugin.extractCredentials(request))
+      None
+      >>> request.response._cookies
+      {}
+
     Instances are persistent:
 
       >>> import persistent.interfaces
@@ -205,15 +229,29 @@ class SessionCredentialsPlugin(persistent.Persistent,
     loginfield = 'login'
     passwordfield = 'password'
 
+    def _hasClientId(self, request):
+        """Return whether the request may belong to a session.
+
+        Without the cookie of a cookie client id manager, it can't.
+        """
+        manager = queryUtility(IClientIdManager)
+        namespace = getattr(manager, 'namespace', None)
+        if namespace is None:
+            return True
+        return (namespace in request.getCookies() or
+                request.response.getCookie(namespace) is not None)
+
     def extractCredentials(self, request):
         """Extracts credentials from a session if they exist."""
         if not IHTTPRequest.providedBy(request):
             return None
+        login = request.get(self.loginfield, None)
+        password = request.get(self.passwordfield, None)
+        if not (login and password) and not self._hasClientId(request):
+            return None
         session = ISession(request)
         sessionData = session.get(
             'zope.pluggableauth.browserplugins')
-        login = request.get(self.loginfield, None)
-        password = request.get(self.passwordfield, None)
         credentials = None
 
         if login and password:
@@ -325,15 +363,137 @@ class SessionCredentialsPlugin(persistent.Persistent,
         return True
 
     def logout(self, request):
-        """Performs logout by clearing session data credentials."""
+        """Performs logout by clearing session data credentials.
+
+        The change is committed with the transaction of the request, so
+        logging out costs no commit of its own.  Session data is only
+        written if there are credentials to clear:
+
+          >>> from zope.session.session import RAMSessionDataContainer
+          >>> from zope.pluggableauth.tests import sessionSetUp
+          >>> from zope.pluggableauth.tests import SessionTestRequest
+          >>> sessionSetUp(RAMSessionDataContainer)
+          >>> from zope.session.interfaces import ISession
+          >>> def sessionData(request):
+          ...     return ISession(request).get(
+          ...         'zope.pluggableauth.browserplugins')
+
+          >>> plugin = SessionCredentialsPlugin()
+          >>> plugin.logout(SessionTestRequest())
+          True
+          >>> print(sessionData(SessionTestRequest()))
+          None
+
+          >>> credentials = plugin.extractCredentials(
+          ...     SessionTestRequest(login='scott', password='tiger'))
+          >>> plugin.logout(SessionTestRequest())
+          True
+          >>> print(sessionData(SessionTestRequest())['credentials'])
+          None
+
+        """
         if not IHTTPRequest.providedBy(request):
             return False
+        if not self._hasClientId(request):
+            return True
+        sessionData = ISession(request).get(
+            'zope.pluggableauth.browserplugins')
+        if sessionData and sessionData.get('credentials') is not None:
+            sessionData['credentials'] = None
+        return True
+
+
+class ISessionTicketCredentials(IBrowserFormChallenger):
+    """A challenger keeping tickets instead of credentials in the session."""
+
+    lifetime = Int(
+        title='Lifetime',
+        description="Number of seconds a ticket is valid.",
+        default=3600)
+
+
+@implementer(ITicketIssuer, ISessionTicketCredentials)
+class SessionTicketCredentialsPlugin(SessionCredentialsPlugin):
+    """A session plugin that keeps an authenticated ticket in the session.
+
+    Unlike `SessionCredentialsPlugin`, this plugin never stores login and
+    password.  Form credentials are only passed on to the authenticators:
+
+      >>> from zope.session.session import RAMSessionDataContainer
+      >>> from zope.pluggableauth.tests import sessionSetUp
+      >>> sessionSetUp(RAMSessionDataContainer)
+      >>> from zope.pluggableauth.tests import SessionTestRequest
+      >>> TestRequest = SessionTestRequest
+
+      >>> plugin = SessionTicketCredentialsPlugin()
+      >>> from pprint import pprint
+      >>> request = TestRequest(login='scott', password='tiger')
+      >>> pprint(plugin.extractCredentials(request))
+      {'login': 'scott', 'password': 'tiger'}
+      >>> print(plugin.extractCredentials(TestRequest()))
+      None
+
+    Once an authenticator accepted the credentials, the principal id is
+    stored in the session together with an expiry (the
+    `zope.pluggableauth.plugins.ticket.issueTicketSubscriber` does this
+    automatically):
+
+      >>> plugin.issueTicket(request, 'users.scott', now=1000)
+      >>> ticket = plugin.extractCredentials(TestRequest(), now=1001)
+      >>> ticket
+      Ticket('users.scott')
+      >>> ticket.expires
+      4600
+
+    The ticket is accepted by the `TicketAuthenticatorPlugin` without
+    checking a password.  After it expired, the principal has to log in
+    again:
+
+      >>> print(plugin.extractCredentials(TestRequest(), now=4600))
+      None
+
+    Logout removes the ticket:
+
+      >>> plugin.logout(TestRequest())
+      True
+      >>> print(plugin.extractCredentials(TestRequest(), now=1001))
+      None
+
+    """
+
+    lifetime = 3600
 
+    def extractCredentials(self, request, now=None):
+        """Return the form credentials or the ticket in the session."""
+        if not IHTTPRequest.providedBy(request):
+            return None
+        login = request.get(self.loginfield, None)
+        password = request.get(self.passwordfield, None)
+        if login and password:
+            return {'login': login, 'password': password}
+        if not self._hasClientId(request):
+            return None
+        sessionData = ISession(request).get(
+            'zope.pluggableauth.browserplugins')
+        if not sessionData:
+            return None
+        ticket = sessionData.get('credentials')
+        if not ITicket.providedBy(ticket):
+            return None
+        if now is None:
+            now = time.time()
+        if ticket.expires <= now:
+            return None
+        return ticket
+
+    def issueTicket(self, request, principalId, now=None):
+        """Store a ticket for `principalId` in the session."""
+        if now is None:
+            now = time.time()
         sessionData = ISession(request)[
             'zope.pluggableauth.browserplugins']
-        sessionData['credentials'] = None
-        transaction.commit()
-        return True
+        sessionData['credentials'] = Ticket(
+            principalId, int(now) + self.lifetime)
 
 
 def redirectWithComeFrom(request, location):
@@ -0,0 +1,187 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Principal folder partitioned over several child principal folders
+"""
+__docformat__ = "reStructuredText"
+
+import heapq
+import itertools
+import zlib
+
+from BTrees.OOBTree import OOBTree
+from persistent import Persistent
+from zope.container.contained import Contained
+from zope.container.interfaces import DuplicateIDError
+from zope.interface import implementer
+
+from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+from zope.pluggableauth.interfaces import IQuerySchemaSearch
+from zope.pluggableauth.plugins.principalfolder import \
+    IInternalPrincipalContainer
+from zope.pluggableauth.plugins.principalfolder import IPrincipalSearchSchema
+from zope.pluggableauth.plugins.principalfolder import LoginTree
+from zope.pluggableauth.plugins.principalfolder import PrincipalFolder
+
+
+def shardIndex(id, count):
+    """Return the shard a principal id belongs to.
+
+    The hash is stable across processes, unlike the builtin `hash`:
+
+      >>> shardIndex('p1', 4), shardIndex('p2', 4), shardIndex('p1', 1)
+      (3, 1, 0)
+
+    """
+    return zlib.crc32(id.encode('utf-8')) % count
+
+
+class PrincipalShard(PrincipalFolder):
+    """A principal folder holding one partition of a sharded folder.
+
+    Logins must be unique across all shards, so the shard also keeps the
+    login index of its sharded folder up to date.
+    """
+
+    def _logins(self):
+        parent = self.__parent__
+        if parent is None:
+            return {}
+        return parent._logins
+
+    def __setitem__(self, id, principal):
+        logins = self._logins()
+        if principal.login in logins:
+            raise DuplicateIDError('Principal Login already taken!')
+        super().__setitem__(id, principal)
+        logins[principal.login] = id
+
+    def __delitem__(self, id):
+        login = self[id].login
+        super().__delitem__(id)
+        self._logins().pop(login, None)
+
+    def notifyLoginChanged(self, oldLogin, principal):
+        logins = self._logins()
+        if principal.login in logins:
+            raise ValueError('Principal Login already taken!')
+        super().notifyLoginChanged(oldLogin, principal)
+        logins.pop(oldLogin, None)
+        logins[principal.login] = principal.__name__
+
+
+@implementer(IAuthenticatorPlugin,
+             IQuerySchemaSearch,
+             IInternalPrincipalContainer)
+class ShardedPrincipalFolder(Persistent, Contained):
+    """A principal folder partitioned over several `PrincipalShard` objects.
+
+    See shardedfolder.rst for details.
+    """
+
+    schema = IPrincipalSearchSchema
+
+    def __init__(self, prefix='', shards=4, conflictCounting=False):
+        self.prefix = prefix
+        # Login to id index over all shards.  Concurrent transactions adding
+        # the same login conflict in it, even for different shards.
+        self._logins = LoginTree() if conflictCounting else OOBTree()
+        if isinstance(shards, int):
+            shards = [PrincipalShard(prefix, conflictCounting)
+                      for i in range(shards)]
+        for i, shard in enumerate(shards):
+            if not isinstance(shard, PrincipalShard):
+                raise TypeError('Shards must be PrincipalShard objects')
+            if shard.prefix != prefix:
+                raise ValueError('Shards must use the prefix of the folder')
+            for id, principal in shard.items():
+                if shardIndex(id, len(shards)) != i:
+                    raise ValueError(
+                        'Principal %r belongs to another shard' % id)
+                if principal.login in self._logins:
+                    raise ValueError('Logins must be unique across shards')
+                self._logins[principal.login] = id
+            shard.__parent__ = self
+            shard.__name__ = str(i)
+        self.shards = tuple(shards)
+
+    def _shard(self, id):
+        return self.shards[shardIndex(id, len(self.shards))]
+
+    def __setitem__(self, id, principal):
+        self._shard(id)[id] = principal
+
+    def __delitem__(self, id):
+        del self._shard(id)[id]
+
+    def __getitem__(self, id):
+        return self._shard(id)[id]
+
+    def get(self, id, default=None):
+        return self._shard(id).get(id, default)
+
+    def __contains__(self, id):
+        return id in self._shard(id)
+
+    has_key = __contains__
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def keys(self):
+        return heapq.merge(*[shard.keys() for shard in self.shards])
+
+    __iter__ = keys
+
+    def items(self):
+        return heapq.merge(*[shard.items() for shard in self.shards],
+                           key=lambda item: item[0])
+
+    def values(self):
+        return (value for key, value in self.items())
+
+    def getGeneration(self):
+        """Return a number that increases whenever a principal changes."""
+        return sum(shard.getGeneration() for shard in self.shards)
+
+    def authenticateCredentials(self, credentials):
+        """Return principal info if credentials can be authenticated
+        """
+        if not isinstance(credentials, dict):
+            return None
+        if not ('login' in credentials and 'password' in credentials):
+            return None
+        id = self._logins.get(credentials['login'])
+        if id is None:
+            return None
+        return self._shard(id).authenticateCredentials(credentials)
+
+    def principalInfo(self, id):
+        if id.startswith(self.prefix):
+            return self._shard(id[len(self.prefix):]).principalInfo(id)
+
+    def getIdByLogin(self, login):
+        return self.prefix + self._logins[login]
+
+    def getCredentialsStamp(self, id):
+        if id.startswith(self.prefix):
+            return self._shard(id[len(self.prefix):]).getCredentialsStamp(id)
+
+    def search(self, query, start=None, batch_size=None):
+        """Search all shards, merging the results in id order."""
+        results = heapq.merge(*[shard.search(query)
+                                for shard in self.shards])
+        stop = None
+        if batch_size is not None:
+            stop = (start or 0) + batch_size
+        return itertools.islice(results, start, stop)
@@ -0,0 +1,202 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Stateless signed-cookie credentials plugin.
+"""
+__docformat__ = 'restructuredtext'
+
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+import persistent
+import zope.container.contained
+from zope.component import hooks
+from zope.interface import implementer
+from zope.publisher.interfaces.http import IHTTPRequest
+from zope.schema import Int
+from zope.schema import TextLine
+from zope.traversing.browser.absoluteurl import absoluteURL
+
+from zope.pluggableauth.plugins.session import IBrowserFormChallenger
+from zope.pluggableauth.plugins.session import redirectWithComeFrom
+from zope.pluggableauth.plugins.ticket import ITicketIssuer
+from zope.pluggableauth.plugins.ticket import Ticket
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class ISignedCookieCredentials(IBrowserFormChallenger):
+    """Credentials plugin keeping a signed ticket in a cookie."""
+
+    cookieName = TextLine(
+        title='Cookie name',
+        description="Name of the cookie holding the ticket.",
+        default='zope.pluggableauth.ticket')
+
+    lifetime = Int(
+        title='Lifetime',
+        description="Number of seconds a ticket is valid.",
+        default=3600)
+
+
+@implementer(ITicketIssuer, ISignedCookieCredentials)
+class SignedCookieCredentialsPlugin(persistent.Persistent,
+                                    zope.container.contained.Contained):
+    """A credentials plugin keeping an HMAC-signed ticket in a cookie.
+
+    Logging in works like with the session plugin: a login form submits the
+    credentials, which are passed on to the authenticator plugins:
+
+      >>> plugin = SignedCookieCredentialsPlugin()
+      >>> from zope.publisher.browser import TestRequest
+      >>> request = TestRequest(login='bob', password='secret')
+      >>> from pprint import pprint
+      >>> pprint(plugin.extractCredentials(request))
+      {'login': 'bob', 'password': 'secret'}
+
+    Once the principal has been authenticated, `issueTicket` puts a signed
+    ticket carrying the principal id and an expiry into a cookie (the
+    `zope.pluggableauth.plugins.ticket.issueTicketSubscriber` does this
+    automatically):
+
+      >>> plugin.issueTicket(request, 'users.bob', now=1000)
+      >>> cookie = request.response.getCookie('zope.pluggableauth.ticket')
+      >>> cookie['path'], cookie['httponly'], cookie['max_age']
+      ('/', True, 3600)
+
+    Later requests present the cookie.  Verifying it costs one HMAC
+    computation; neither session storage nor password hashing is involved:
+
+      >>> request = TestRequest(
+      ...     HTTP_COOKIE='zope.pluggableauth.ticket=' + cookie['value'])
+      >>> ticket = plugin.extractCredentials(request, now=1001)
+      >>> ticket
+      Ticket('users.bob')
+      >>> ticket.expires
+      4600
+
+    Expired tickets are ignored:
+
+      >>> print(plugin.extractCredentials(request, now=4600))
+      None
+
+    and so are tampered ones or ones signed with another secret:
+
+      >>> principalId, expires, signature = cookie['value'].split('.')
+      >>> forged = '.'.join([principalId, '99999', signature])
+      >>> print(plugin.extractCredentials(TestRequest(
+      ...     HTTP_COOKIE='zope.pluggableauth.ticket=' + forged), now=1001))
+      None
+      >>> print(plugin.extractCredentials(TestRequest(
+      ...     HTTP_COOKIE='zope.pluggableauth.ticket=garbage'), now=1001))
+      None
+      >>> print(SignedCookieCredentialsPlugin().extractCredentials(
+      ...     request, now=1001))
+      None
+
+    Logout expires the cookie.  As tickets are not stored anywhere, a copy
+    of the cookie stays valid until it expires:
+
+      >>> request = TestRequest()
+      >>> plugin.logout(request)
+      True
+      >>> request.response.getCookie('zope.pluggableauth.ticket')['value']
+      'deleted'
+
+    The plugin only works with HTTP requests:
+
+      >>> from zope.publisher.base import TestRequest
+      >>> print(plugin.extractCredentials(TestRequest('/')))
+      None
+      >>> plugin.logout(TestRequest('/'))
+      False
+
+    """
+
+    loginpagename = 'loginForm.html'
+    loginfield = 'login'
+    passwordfield = 'password'
+    cookieName = 'zope.pluggableauth.ticket'
+    lifetime = 3600
+
+    def __init__(self):
+        self.secret = os.urandom(32)
+
+    def _sign(self, payload):
+        return hmac.new(self.secret, payload.encode('ascii'),
+                        hashlib.sha256).digest()
+
+    def issueTicket(self, request, principalId, now=None):
+        """Set a cookie with a ticket for `principalId` on the response."""
+        if now is None:
+            now = time.time()
+        payload = '{}.{}'.format(
+            _b64encode(principalId.encode('utf-8')),
+            int(now) + self.lifetime)
+        value = payload + '.' + _b64encode(self._sign(payload))
+        request.response.setCookie(
+            self.cookieName, value, path='/', max_age=self.lifetime,
+            httponly=True, secure=request.getURL().startswith('https:'))
+
+    def extractCredentials(self, request, now=None):
+        """Return the form credentials or a verified ticket."""
+        if not IHTTPRequest.providedBy(request):
+            return None
+        login = request.get(self.loginfield, None)
+        password = request.get(self.passwordfield, None)
+        if login and password:
+            return {'login': login, 'password': password}
+        value = request.getCookies().get(self.cookieName)
+        if not value:
+            return None
+        try:
+            principalId, expires, signature = value.split('.')
+            payload = principalId + '.' + expires
+            if not hmac.compare_digest(self._sign(payload),
+                                       _b64decode(signature)):
+                return None
+            expires = int(expires)
+            principalId = _b64decode(principalId).decode('utf-8')
+        except ValueError:
+            # Includes binascii.Error and UnicodeError
+            return None
+        if now is None:
+            now = time.time()
+        if expires <= now:
+            return None
+        return Ticket(principalId, expires)
+
+    def challenge(self, request):
+        """Challenges by redirecting to a login form."""
+        if not IHTTPRequest.providedBy(request):
+            return False
+        site = hooks.getSite()
+        redirectWithComeFrom(request, '{}/@@{}'.format(
+            absoluteURL(site, request), self.loginpagename))
+        return True
+
+    def logout(self, request):
+        """Performs logout by expiring the ticket cookie."""
+        if not IHTTPRequest.providedBy(request):
+            return False
+        request.response.expireCookie(self.cookieName, path='/')
+        return True
@@ -0,0 +1,295 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Read-only in-memory snapshot of a principal folder
+"""
+__docformat__ = "reStructuredText"
+
+import logging
+import threading
+import time
+
+from zope.component import getUtility
+from zope.interface import implementer
+from zope.password.interfaces import IPasswordManager
+
+from zope.pluggableauth.factories import PrincipalInfo
+from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+from zope.pluggableauth.interfaces import IQuerySchemaSearch
+from zope.pluggableauth.plugins.principalfolder import ISearchSchema
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrincipalSnapshot:
+    """An immutable table of the principals of a principal folder.
+
+    `records` is a tuple of ``(id, login, password, passwordManagerName,
+    title, description)`` tuples sorted by id; the ids include the folder
+    prefix.  `byLogin` and `byId` map to positions in `records`.
+    """
+
+    def __init__(self, folder):
+        self.prefix = folder.prefix
+        self.generation = folder.getGeneration()
+        self.records = tuple(
+            (folder.prefix + id, internal.login, internal.password,
+             internal.passwordManagerName, internal.title,
+             internal.description)
+            for id, internal in folder.items())
+        self.byLogin = {record[1]: i for i, record in enumerate(self.records)}
+        self.byId = {record[0]: i for i, record in enumerate(self.records)}
+
+
+def _info(record):
+    return PrincipalInfo(record[0], record[1], record[4], record[5])
+
+
+@implementer(IAuthenticatorPlugin, IQuerySchemaSearch)
+class SnapshotAuthenticatorPlugin:
+    """Authenticator serving principals from a snapshot of a principal folder.
+
+    The snapshot is taken once and then answers all queries from memory,
+    which suits nodes that mostly read principal data changed rarely.
+
+      >>> from zope.pluggableauth.plugins.principalfolder import (
+      ...     PrincipalFolder, InternalPrincipal)
+      >>> folder = PrincipalFolder('principal.')
+      >>> folder['p1'] = InternalPrincipal('bob', '123', 'Bob',
+      ...                                  passwordManagerName='SHA1')
+      >>> folder['p2'] = InternalPrincipal('sue', '456', 'Sue',
+      ...                                  'The admin.',
+      ...                                  passwordManagerName='SHA1')
+
+      >>> plugin = SnapshotAuthenticatorPlugin(folder)
+      >>> plugin.authenticateCredentials({'login': 'bob', 'password': '123'})
+      PrincipalInfo('principal.p1')
+      >>> plugin.authenticateCredentials({'login': 'bob', 'password': '456'})
+      >>> plugin.authenticateCredentials({'login': 'tim', 'password': '123'})
+      >>> plugin.authenticateCredentials('bob')
+
+      >>> info = plugin.principalInfo('principal.p2')
+      >>> info.login, info.title, info.description
+      ('sue', 'Sue', 'The admin.')
+      >>> plugin.principalInfo('p2')
+
+    Searching works like it does for the principal folder:
+
+      >>> list(plugin.search({'search': 'admin'}))
+      ['principal.p2']
+      >>> list(plugin.search({'search': ''}, start=1))
+      ['principal.p2']
+      >>> list(plugin.search({'search': ''}, batch_size=1))
+      ['principal.p1']
+      >>> list(plugin.search({}))
+      []
+
+    Changes to the folder are not visible until the snapshot is refreshed:
+
+      >>> folder['p1'].password = 'secret'
+      >>> plugin.authenticateCredentials({'login': 'bob', 'password': '123'})
+      PrincipalInfo('principal.p1')
+
+    Refreshing only rebuilds the snapshot if the generation of the folder
+    changed since the snapshot was taken:
+
+      >>> plugin.refresh(folder)
+      True
+      >>> plugin.refresh(folder)
+      False
+      >>> plugin.authenticateCredentials({'login': 'bob', 'password': '123'})
+      >>> plugin.authenticateCredentials(
+      ...     {'login': 'bob', 'password': 'secret'})
+      PrincipalInfo('principal.p1')
+
+    The snapshot can be refreshed in a background thread.  It opens a
+    connection of the database for every check and passes the root object
+    to a function returning the principal folder:
+
+      >>> import contextlib
+      >>> class DB:
+      ...     @contextlib.contextmanager
+      ...     def transaction(self):
+      ...         yield Connection()
+      >>> class Connection:
+      ...     def root(self):
+      ...         return {'principals': folder}
+
+      >>> del folder['p2']
+      >>> plugin.startRefreshing(DB(), lambda root: root['principals'],
+      ...                        interval=0.01)
+      >>> import time
+      >>> for i in range(500):
+      ...     if plugin.principalInfo('principal.p2') is None:
+      ...         break
+      ...     time.sleep(0.01)
+      >>> plugin.isHealthy()
+      True
+      >>> plugin.stopRefreshing()
+      >>> print(plugin.principalInfo('principal.p2'))
+      None
+      >>> plugin.isHealthy()
+      False
+
+    Errors, like a lost connection to the database, are logged, and the
+    refresh is tried again after the next interval:
+
+      >>> from zope.testing.loggingsupport import InstalledHandler
+      >>> handler = InstalledHandler('zope.pluggableauth.plugins.snapshot')
+      >>> calls = []
+      >>> def getFolder(root):
+      ...     calls.append(root)
+      ...     if len(calls) == 1:
+      ...         raise ConnectionError('disconnected')
+      ...     return root['principals']
+
+      >>> folder['p3'] = InternalPrincipal('tim', '789', 'Tim',
+      ...                                  passwordManagerName='SHA1')
+      >>> plugin.startRefreshing(DB(), getFolder, interval=0.01)
+      >>> for i in range(500):
+      ...     if plugin.principalInfo('principal.p3') is not None:
+      ...         break
+      ...     time.sleep(0.01)
+      >>> plugin.principalInfo('principal.p3')
+      PrincipalInfo('principal.p3')
+      >>> for record in handler.records:
+      ...     print(record.levelname, record.getMessage(), record.exc_info[1])
+      ERROR Refreshing the principal snapshot failed disconnected
+
+    `isHealthy` is false while the last refresh failed, and `lastRefresh`
+    tells when the snapshot was last checked successfully:
+
+      >>> plugin.isHealthy(), plugin.lastError
+      (True, None)
+      >>> plugin.lastRefresh is not None
+      True
+      >>> plugin.stopRefreshing()
+      >>> handler.uninstall()
+
+    """
+
+    schema = ISearchSchema
+
+    _thread = None
+
+    # Error of the last refresh in the background, None if it succeeded
+    lastError = None
+
+    # Time of the last successful refresh in the background
+    lastRefresh = None
+
+    def __init__(self, folder):
+        self._snapshot = PrincipalSnapshot(folder)
+
+    def refresh(self, folder):
+        """Rebuild the snapshot if the folder changed.
+
+        The new snapshot replaces the old one in a single assignment, so
+        concurrent readers see either of them, but never a mix.
+        """
+        snapshot = self._newSnapshot(folder)
+        if snapshot is None:
+            return False
+        self._snapshot = snapshot
+        return True
+
+    def _newSnapshot(self, folder):
+        if folder.getGeneration() == self._snapshot.generation:
+            return None
+        return PrincipalSnapshot(folder)
+
+    def startRefreshing(self, db, getFolder, interval=60):
+        """Refresh the snapshot from `db` every `interval` seconds.
+
+        Errors are logged and don't stop the refreshing.
+        """
+        self.stopRefreshing()
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    with db.transaction() as connection:
+                        snapshot = self._newSnapshot(
+                            getFolder(connection.root()))
+                except Exception as e:
+                    self.lastError = e
+                    logger.exception(
+                        'Refreshing the principal snapshot failed')
+                    continue
+                # Record the success before publishing the snapshot, so
+                # that whoever sees the new snapshot sees it too.
+                self.lastError = None
+                self.lastRefresh = time.time()
+                if snapshot is not None:
+                    self._snapshot = snapshot
+
+        thread = threading.Thread(target=run, name='principal snapshot')
+        thread.daemon = True
+        thread.stop = stop
+        self._thread = thread
+        thread.start()
+
+    def isHealthy(self):
+        """Return whether the snapshot is refreshed without errors."""
+        thread = self._thread
+        return (thread is not None and thread.is_alive()
+                and self.lastError is None)
+
+    def stopRefreshing(self):
+        thread = self._thread
+        if thread is not None:
+            self._thread = None
+            thread.stop.set()
+            thread.join()
+
+    def authenticateCredentials(self, credentials):
+        """Return principal info if credentials can be authenticated
+        """
+        if not isinstance(credentials, dict):
+            return None
+        if not ('login' in credentials and 'password' in credentials):
+            return None
+        snapshot = self._snapshot
+        i = snapshot.byLogin.get(credentials['login'])
+        if i is None:
+            return None
+        record = snapshot.records[i]
+        passwordManager = getUtility(IPasswordManager, record[3])
+        if not passwordManager.checkPassword(record[2],
+                                             credentials['password']):
+            return None
+        return _info(record)
+
+    def principalInfo(self, id):
+        snapshot = self._snapshot
+        i = snapshot.byId.get(id)
+        if i is not None:
+            return _info(snapshot.records[i])
+
+    def search(self, query, start=None, batch_size=None):
+        """Search through the snapshot."""
+        search = query.get('search')
+        if search is None:
+            return
+        search = search.lower()
+        n = 1
+        for i, record in enumerate(self._snapshot.records):
+            if (search in record[4].lower() or
+                search in record[5].lower() or
+                    search in record[1].lower()):
+                if not ((start is not None and i < start)
+                        or (batch_size is not None and n > batch_size)):
+                    n += 1
+                    yield record[0]
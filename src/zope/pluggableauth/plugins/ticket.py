@@ -0,0 +1,176 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Tickets proving an earlier authentication.
+
+Credentials plugins implementing `ITicketIssuer` remember principals that
+authenticated and hand out `ITicket` credentials for them on later requests.
+The `TicketAuthenticatorPlugin` accepts those without checking a password.
+"""
+__docformat__ = 'restructuredtext'
+
+import persistent
+import zope.container.contained
+from zope.component import adapter
+from zope.interface import Interface
+from zope.interface import implementer
+from zope.schema import Int
+from zope.schema import TextLine
+
+from zope.pluggableauth.interfaces import IAuthenticatedPrincipalCreated
+from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+from zope.pluggableauth.interfaces import ICredentialsPlugin
+
+
+class ITicket(Interface):
+    """Credentials proving that a principal authenticated before.
+
+    Tickets are only created by credentials plugins that verified them, so
+    authenticators may trust them without checking a password.
+    """
+
+    principalId = TextLine(
+        title='Principal Id',
+        description="The id of the principal as returned by its"
+        " authenticator plugin.")
+
+    expires = Int(
+        title='Expires',
+        description="Time (in seconds since the epoch) the ticket expires.")
+
+
+@implementer(ITicket)
+class Ticket:
+    """A verified ticket.
+
+      >>> ticket = Ticket('users.bob', 1000)
+      >>> ticket
+      Ticket('users.bob')
+      >>> ticket.principalId, ticket.expires
+      ('users.bob', 1000)
+
+    """
+
+    def __init__(self, principalId, expires):
+        self.principalId = principalId
+        self.expires = expires
+
+    def __repr__(self):
+        return 'Ticket(%r)' % self.principalId
+
+
+class ITicketIssuer(ICredentialsPlugin):
+    """A credentials plugin handing out tickets."""
+
+    def issueTicket(request, principalId):
+        """Remember that `principalId` authenticated with `request`.
+
+        Later requests should be answered with an `ITicket` from
+        `extractCredentials`.
+        """
+
+
+@implementer(IAuthenticatorPlugin)
+class TicketAuthenticatorPlugin(persistent.Persistent,
+                                zope.container.contained.Contained):
+    """Authenticates tickets verified by a credentials plugin.
+
+    The principal information is looked up from the other authenticator
+    plugins of the pluggable authentication utility containing this plugin.
+
+      >>> from zope.pluggableauth.factories import PrincipalInfo
+      >>> @implementer(IAuthenticatorPlugin)
+      ... class Principals:
+      ...     def authenticateCredentials(self, credentials):
+      ...         raise AssertionError('Passwords are not checked')
+      ...     def principalInfo(self, id):
+      ...         if id == 'users.bob':
+      ...             return PrincipalInfo(id, 'bob', 'Bob', '')
+
+      >>> class PAU:
+      ...     def getAuthenticatorPlugins(self):
+      ...         return [('tickets', plugin), ('users', Principals())]
+
+      >>> plugin = TicketAuthenticatorPlugin()
+      >>> plugin.__parent__ = PAU()
+      >>> plugin.authenticateCredentials(Ticket('users.bob', 1000))
+      PrincipalInfo('users.bob')
+      >>> print(plugin.authenticateCredentials(Ticket('users.tim', 1000)))
+      None
+
+    Other credentials are not authenticated, and the plugin does not provide
+    principals itself:
+
+      >>> print(plugin.authenticateCredentials(
+      ...     {'login': 'bob', 'password': 'secret'}))
+      None
+      >>> print(plugin.principalInfo('users.bob'))
+      None
+
+    """
+
+    def authenticateCredentials(self, credentials):
+        if not ITicket.providedBy(credentials):
+            return None
+        for name, plugin in self.__parent__.getAuthenticatorPlugins():
+            if plugin is self:
+                continue
+            info = plugin.principalInfo(credentials.principalId)
+            if info is not None:
+                return info
+        return None
+
+    def principalInfo(self, id):
+        return None
+
+
+@adapter(IAuthenticatedPrincipalCreated)
+def issueTicketSubscriber(event):
+    """Issue a ticket after a login through a ticket issuer.
+
+      >>> @implementer(ITicketIssuer)
+      ... class Issuer:
+      ...     def issueTicket(self, request, principalId):
+      ...         print('Ticket for', principalId)
+
+      >>> from zope.pluggableauth.factories import PrincipalInfo
+      >>> from zope.pluggableauth.interfaces import (
+      ...     AuthenticatedPrincipalCreated)
+      >>> info = PrincipalInfo('users.bob', 'bob', 'Bob', '')
+      >>> info.credentialsPlugin = Issuer()
+      >>> info.authenticatorPlugin = object()
+      >>> issueTicketSubscriber(AuthenticatedPrincipalCreated(
+      ...     None, None, info, 'request'))
+      Ticket for users.bob
+
+    No new ticket is issued when a ticket was authenticated:
+
+      >>> info.authenticatorPlugin = TicketAuthenticatorPlugin()
+      >>> issueTicketSubscriber(AuthenticatedPrincipalCreated(
+      ...     None, None, info, 'request'))
+
+    nor for other credentials plugins:
+
+      >>> info.credentialsPlugin = object()
+      >>> info.authenticatorPlugin = object()
+      >>> issueTicketSubscriber(AuthenticatedPrincipalCreated(
+      ...     None, None, info, 'request'))
+
+    """
+    info = event.info
+    plugin = getattr(info, 'credentialsPlugin', None)
+    if not ITicketIssuer.providedBy(plugin):
+        return
+    if isinstance(info.authenticatorPlugin, TicketAuthenticatorPlugin):
+        return
+    plugin.issueTicket(event.request, info.id)
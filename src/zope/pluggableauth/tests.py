@@ -18,6 +18,8 @@ __docformat__ = "reStructuredText"
 import doctest
 import unittest
 
+import persistent
+import transaction
 import zope.component
 import zope.component.eventtesting
 import zope.component.testing
@@ -28,7 +30,10 @@ from zope.interface import Interface
 from zope.interface import implementer
 from zope.interface.interfaces import IComponentLookup
 from zope.publisher import base
+from zope.publisher.browser import TestRequest
 from zope.publisher.interfaces import IRequest
+from zope.security.management import endInteraction
+from zope.security.management import newInteraction
 from zope.session.http import CookieClientIdManager
 from zope.session.interfaces import IClientId
 from zope.session.interfaces import IClientIdManager
@@ -43,6 +48,10 @@ from zope.site.site import SiteManagerAdapter
 from zope.traversing.interfaces import ITraversable
 from zope.traversing.testing import setUp
 
+from zope.pluggableauth.factories import AuthenticatedPrincipalFactory
+from zope.pluggableauth.factories import PrincipalInfo
+from zope.pluggableauth.interfaces import IAuthenticatorPlugin
+from zope.pluggableauth.interfaces import ICredentialsPlugin
 from zope.pluggableauth.plugins.session import SessionCredentialsPlugin
 
 
@@ -85,6 +94,13 @@ def sessionSetUp(container=PersistentSessionDataContainer):
     zope.component.provideUtility(container(), ISessionDataContainer, '')
 
 
+def SessionTestRequest(**kw):
+    """A browser request sending the client id cookie of the test session."""
+    namespace = zope.component.getUtility(IClientIdManager).namespace
+    return TestRequest(HTTP_COOKIE='{}={}'.format(
+        namespace, TestClientId(None)), **kw)
+
+
 def nonHTTPSessionTestCaseSetUp(container=PersistentSessionDataContainer):
     # I am getting an error with ClientId and not TestClientId
     zope.component.provideAdapter(ClientId, [IRequest], IClientId)
@@ -121,6 +137,186 @@ class NonHTTPSessionTestCase(unittest.TestCase):
             plugin.logout(base.TestRequest('/')), False)
 
 
+class SweepWhileAuthenticatingTestCase(unittest.TestCase):
+    """Sweeping while authenticating a PAU stored in a database."""
+
+    def setUp(self):
+        from ZODB import DB
+
+        from zope.pluggableauth.authentication import PluggableAuthentication
+        from zope.pluggableauth.plugins.remember import \
+            RememberMeCredentialsPlugin
+        self.db = DB(None)
+        self.manager = transaction.TransactionManager()
+        self.connection = self.db.open(transaction_manager=self.manager)
+        self.pau = PluggableAuthentication()
+        self.pau['remember'] = remember = RememberMeCredentialsPlugin()
+        self.pau.credentialsPlugins = ('remember', )
+        self.pau.sweepLimit = 10
+        self.pau.sweepInterval = 0
+        for i in range(3):
+            remember.issueTicket(TestRequest(remember='on'), 'bob', now=0)
+        self.connection.root()['pau'] = self.pau
+        self.manager.commit()
+
+    def tearDown(self):
+        self.manager.abort()
+        self.connection.close()
+        self.db.close()
+
+    def _remembered(self):
+        manager = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=manager)
+        try:
+            return len(connection.root()['pau']['remember'])
+        finally:
+            connection.close()
+
+    def test_sweep_in_own_transaction(self):
+        from zope.pluggableauth import authentication
+        authentication.resetSweepCounts()
+        self.assertIsNone(self.pau.authenticate(TestRequest()))
+        # The transaction of the request did not write anything
+        self.assertEqual(self.connection._registered_objects, [])
+        self.assertEqual(self._remembered(), 0)
+        self.assertEqual(authentication.getSweepCounts(), {'remember': 3})
+
+    def test_conflicts_are_dropped(self):
+        from ZODB.POSException import ConflictError
+
+        from zope.pluggableauth import authentication
+        from zope.pluggableauth.plugins.remember import \
+            RememberMeCredentialsPlugin
+
+        def sweep(self, limit=None, now=None):
+            raise ConflictError()
+
+        authentication.resetSweepCounts()
+        original = RememberMeCredentialsPlugin.sweep
+        RememberMeCredentialsPlugin.sweep = sweep
+        try:
+            self.assertIsNone(self.pau.authenticate(TestRequest()))
+        finally:
+            RememberMeCredentialsPlugin.sweep = original
+        self.assertEqual(self._remembered(), 3)
+        self.assertEqual(authentication.getSweepCounts(), {})
+
+        # The next sweep removes the entries
+        self.assertIsNone(self.pau.authenticate(TestRequest()))
+        self.assertEqual(self._remembered(), 0)
+
+
+@implementer(ICredentialsPlugin)
+class LoginCredentialsPlugin(persistent.Persistent):
+
+    credentialsCacheLifetime = 300
+
+    def extractCredentials(self, request):
+        return {'login': request.get('login'),
+                'password': request.get('password')}
+
+
+@implementer(IAuthenticatorPlugin)
+class CountingAuthenticatorPlugin(persistent.Persistent):
+
+    checks = []
+
+    def authenticateCredentials(self, credentials):
+        self.checks.append(credentials['login'])
+        if credentials == {'login': 'bob', 'password': 'secret'}:
+            return PrincipalInfo('bob', 'bob', 'Bob', '')
+
+
+class CredentialsCacheTestCase(unittest.TestCase):
+    """Remembered authentications of a PAU stored in a database."""
+
+    def setUp(self):
+        from ZODB import DB
+
+        from zope.pluggableauth.authentication import PluggableAuthentication
+        zope.component.provideAdapter(AuthenticatedPrincipalFactory)
+        self.db = DB(None)
+        manager = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=manager)
+        pau = PluggableAuthentication()
+        pau['credentials'] = LoginCredentialsPlugin()
+        pau['authenticator'] = CountingAuthenticatorPlugin()
+        pau.credentialsPlugins = ('credentials', )
+        pau.authenticatorPlugins = ('authenticator', )
+        connection.root()['pau'] = pau
+        manager.commit()
+        connection.close()
+        del CountingAuthenticatorPlugin.checks[:]
+
+    def tearDown(self):
+        self.db.close()
+        zope.component.testing.tearDown()
+
+    def _open(self):
+        manager = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=manager)
+        self.addCleanup(connection.close)
+        self.addCleanup(manager.abort)
+        return connection
+
+    def _authenticate(self, connection):
+        return connection.root()['pau'].authenticate(
+            TestRequest(login='bob', password='secret'))
+
+    def test_shared_between_connections(self):
+        first, second = self._open(), self._open()
+        self.assertIsNot(first, second)
+        self.assertEqual(self._authenticate(first).id, 'bob')
+        self.assertEqual(self._authenticate(second).id, 'bob')
+        self.assertEqual(CountingAuthenticatorPlugin.checks, ['bob'])
+
+    def test_kept_when_pau_is_ghosted(self):
+        connection = self._open()
+        self._authenticate(connection)
+        connection.cacheMinimize()
+        self.assertEqual(connection.root()['pau']._p_status, 'ghost')
+        self.assertEqual(self._authenticate(connection).id, 'bob')
+        self.assertEqual(CountingAuthenticatorPlugin.checks, ['bob'])
+
+
+class GroupCycleInInteractionTestCase(unittest.TestCase):
+    """Cycle checks while principals are remembered during a request."""
+
+    def setUp(self):
+        from zope.authentication.interfaces import IAuthentication
+
+        from zope.pluggableauth.authentication import PluggableAuthentication
+        from zope.pluggableauth.factories import FoundPrincipalFactory
+        from zope.pluggableauth.interfaces import IPrincipalCreated
+        from zope.pluggableauth.plugins.groupfolder import FoundGroupFactory
+        from zope.pluggableauth.plugins.groupfolder import GroupFolder
+        from zope.pluggableauth.plugins.groupfolder import GroupInformation
+        from zope.pluggableauth.plugins.groupfolder import \
+            setGroupsForPrincipal
+        zope.component.provideAdapter(FoundPrincipalFactory)
+        zope.component.provideAdapter(FoundGroupFactory)
+        zope.component.provideHandler(
+            setGroupsForPrincipal, [IPrincipalCreated])
+        pau = PluggableAuthentication('pau.')
+        pau['g'] = self.groups = GroupFolder('g.')
+        pau.authenticatorPlugins = ('g', )
+        zope.component.provideUtility(pau, IAuthentication)
+        self.groups['A'] = GroupInformation()
+        self.groups['B'] = GroupInformation()
+
+    def tearDown(self):
+        endInteraction()
+        zope.component.testing.tearDown()
+
+    def test_cycle_detected_in_interaction(self):
+        from zope.pluggableauth.plugins.groupfolder import GroupCycle
+        newInteraction(TestRequest())
+        self.groups['A'].principals = ['pau.g.B']
+        with self.assertRaises(GroupCycle):
+            self.groups['B'].principals = ['pau.g.A']
+        self.assertEqual(self.groups['B'].principals, ())
+
+
 def setupPassword(test):
     from zope.password.interfaces import IPasswordManager
     from zope.password.password import SHA1PasswordManager
@@ -147,10 +343,20 @@ def test_suite():
             **kwargs)
 
     module_tests = [module_test('plugins.' + m) for m in
-                    ('generic', 'ftpplugins',
+                    ('apikey', 'generic', 'ftpplugins',
                      'httpplugins', 'idpicker',
                      'principalfolder',
-                     'groupfolder',)]
+                     'groupfolder',
+                     'shardedfolder',
+                     'signedcookie',
+                     'ticket',)]
+
+    module_tests.append(module_test('plugins.remember',
+                                    tearDown=zope.component.testing.tearDown))
+
+    module_tests.append(module_test('plugins.snapshot',
+                                    setUp=setupPassword,
+                                    tearDown=zope.component.testing.tearDown))
 
     module_tests.append(module_test('plugins.session',
                                     setUp=siteSetUp,
@@ -171,6 +377,8 @@ def test_suite():
         setup in (
             ('plugins/principalfolder',
              setupPassword),
+            ('plugins/shardedfolder',
+             setupPassword),
             ('plugins/groupfolder',
              zope.component.eventtesting.setUp))]
 